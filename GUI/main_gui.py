@@ -7,6 +7,8 @@ Created on Fri Jul 17 18:20:27 2020
 
 import logging
 import sys
+from dataclasses import dataclass, field
+from typing import Optional
 
 from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtCore import QUrl
@@ -28,29 +30,132 @@ from Language import Language
 
 import main_window
 
-# Global variables ___________________________________________________________
+# GUI State __________________________________________________________________
 
-ftm_list = []  # Forward transition matrices list
-btm_list = []  # Backward transition matrices list
-fk_list = []  # Forward Kinematics List
-jac_list = []  # Jacobian list
-com_list = []  # Center of mass list
-com_jac_list = [] # Center of mass jacobians list
-polynomial_trajectories = []  # Polynomial trajectories list
-control_loops_list = []  # Control loops list
+@dataclass
+class GuiState:
+    """
+    Description
+    -----------
+
+    State  shared  by  all  the  GUI callbacks. A single instance is created in
+    main() and given to every callback through its closure.
+
+    Member Data
+    -----------
+
+    ftm_list : list of str
+        Forward transition matrices list
+
+    btm_list : list of str
+        Backward transition matrices list
+
+    fk_list : list of list of str
+        Forward Kinematics list. Every element is [origin, destination,
+        content]
+
+    jac_list : list of list of str
+        Jacobians list. Every element is [origin, destination, content]
+
+    fk_set : set of tuple of str
+        Same elements as fk_list, stored as tuples for the duplicate checks
+
+    jac_set : set of tuple of str
+        Same elements as jac_list, stored as tuples for the duplicate checks
+
+    com_list : list of str
+        Contents of the centers of mass
+
+    com_jac_list : list of str
+        Contents of the center of mass jacobians
+
+    polynomial_trajectories : list of dict
+        list of all the polynomial trajectories to generate.
+
+        Every item of this list must be a dict with the following structure :
+
+        {"name": str : Name of the trajectory,
+
+         "conditions" : list of list of 3 str :
+
+            [..., [k, t, x], ...]
+
+            k : str representing an integer
+                Order  of  the  derivative.  If  the  time  is your derivative
+                variable  and  the function you  want to create describes your
+                position,  0 corresponds to the position, 1 to the speed, 2 to
+                the acceleration, 3 to the jerk and so on.
+            t : str representing a float or a symbol
+                Time value on which you want your condition to be set
+            x : str representing a float or a symbol
+                Value  of the  function  for  the  given  time.  This can be a
+                symbolic variable
+        }
+
+    control_loops_list : list of dict
+        list of all the control_loops to generate.
+
+        Every item of this list must be a dict with the following structure :
+
+        {"type" : str
+            "effector" or "com" for task 1
+         "type_2" : str or None
+            "effector" or "com" or None for task 2
+         "ids" : list of str
+            Origin, destination and content for task 1
+         "ids_2" : list of str
+            Origin, destination and content for task 2
+         "trajectory" : str
+            Polynomial trajectory used
+         "control_type" : str
+            "geometric", "positions" or "velocities"
+         "coppelia" : bool
+            True if coppelia sim support is enabled
+         "constraints" : bool
+            True if the constraints are enabled
+        }
+
+    robot_obj : robots.Robot or None
+        Robot Object. None until a file is opened
+
+    settings : dict
+        Dictionary of the settings for the code generation
 
-robot_obj = 0  # Robot Object
+    """
+
+    ftm_list: list = field(default_factory=list)
+    btm_list: list = field(default_factory=list)
+    fk_list: list = field(default_factory=list)
+    jac_list: list = field(default_factory=list)
+    fk_set: set = field(default_factory=set)
+    jac_set: set = field(default_factory=set)
+    com_list: list = field(default_factory=list)
+    com_jac_list: list = field(default_factory=list)
+    polynomial_trajectories: list = field(default_factory=list)
+    control_loops_list: list = field(default_factory=list)
+    robot_obj: Optional[cr.Robot] = None
+    settings: dict = field(default_factory=lambda: {
+        "language": "Julia",
+        "filename": "out",
+        "optimization_level": 2})
 
-settings = {"language": "Julia",
-            "filename": "out",
-            "optimization_level": 2}
 
 path = './GUI/'
 
+# Help menu links
+_DOC_URL = QUrl("https://github.com/Teskann/NYXX/blob/master/documentation"
+                "/usermanual.md")
+_GH_URL = QUrl("https://github.com/Teskann/NYXX")
+_BUG_URL = QUrl("https://github.com/Teskann/NYXX/issues/new")
+
+# Content of dark.qss, read on the first call to main()
+_STYLESHEET = None
+
 
 # Add joint to a list from combobox __________________________________________
 
-def add_joint_to_list(list_widget, combo_box, add_btn, del_btn, forward):
+def add_joint_to_list(state, list_widget, combo_box, add_btn, del_btn,
+                      forward):
     """
     Description
     -----------
@@ -61,6 +166,9 @@ def add_joint_to_list(list_widget, combo_box, add_btn, del_btn, forward):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     list_widget : PyQt5.QtWidgets.QListWidget
         List to add an element to
         
@@ -77,18 +185,6 @@ def add_joint_to_list(list_widget, combo_box, add_btn, del_btn, forward):
         True if the list to update is the Forward transition matrices list
         False if the list to update is the Backward transition matrices list
     
-    Global Variables Used
-    ---------------------
-    
-    ftm_list : list of string
-        list of all the joints to generate the code
-    
-    btm_list : list of string
-        list of all the joints to generate the code
-    
-    robot_obj : robots.Robot
-        Robot Object
-    
     Returns
     -------
     
@@ -96,30 +192,26 @@ def add_joint_to_list(list_widget, combo_box, add_btn, del_btn, forward):
     
     """
 
-    global ftm_list  # Forward transition matrices list
-    global btm_list  # Backward transition matrices list
-    global robot_obj
-
     # Getting the current item
     ind = combo_box.currentIndex()
 
     # Finding the associated joint
     i_joint = 0
-    for _, _, node in robot_obj.tree:
-        type_, nb = node.name.split('_')
-        nb = int(nb)
+    for _, _, node in state.robot_obj.tree:
+        type_ = node._type
+        nb = node._nb
 
         if type_ == 'joint':
             if forward:
-                if 'joint_' + str(nb) in ftm_list:
+                if 'joint_' + str(nb) in state.ftm_list:
                     i_joint += 1
                     continue
             else:
-                if 'joint_' + str(nb) in btm_list:
+                if 'joint_' + str(nb) in state.btm_list:
                     i_joint += 1
                     continue
             if ind == nb:
-                text = robot_obj.joints[nb].name
+                text = state.robot_obj.joints[nb].name
                 list_widget.addItem(text)
 
                 # Disabling the item in the combo box
@@ -131,16 +223,17 @@ def add_joint_to_list(list_widget, combo_box, add_btn, del_btn, forward):
                 del_btn.setEnabled(True)
 
                 if forward:
-                    ftm_list.append("joint_" + str(nb))
+                    state.ftm_list.append("joint_" + str(nb))
                 else:
-                    btm_list.append("joint_" + str(nb))
+                    state.btm_list.append("joint_" + str(nb))
 
             i_joint += 1
 
 
 # Remove a joint from a list _________________________________________________
 
-def del_joint_from_list(list_widget, combo_box, add_btn, del_btn, forward):
+def del_joint_from_list(state, list_widget, combo_box, add_btn, del_btn,
+                        forward):
     """
     Description
     -----------
@@ -150,6 +243,9 @@ def del_joint_from_list(list_widget, combo_box, add_btn, del_btn, forward):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     list_widget : PyQt5.QtWidgets.QListWidget
         List in which you want to delete the item
         
@@ -166,18 +262,6 @@ def del_joint_from_list(list_widget, combo_box, add_btn, del_btn, forward):
         True if the list to update is the Forward transition matrices list
         False if the list to update is the Backward transition matrices list
     
-    Global Variables Used
-    ---------------------
-    
-    ftm_list : list of string
-        list of all the joints to generate the code
-    
-    btm_list : list of string
-        list of all the joints to generate the code
-    
-    robot_obj : robots.Robot
-        Robot Object
-    
     Returns
     -------
     
@@ -185,22 +269,18 @@ def del_joint_from_list(list_widget, combo_box, add_btn, del_btn, forward):
     
     """
 
-    global ftm_list  # Forward transition matrices list
-    global btm_list  # Backward transition matrices list
-    global robot_obj
-
     # Getting the selected items
     selection = list_widget.selectedItems()
 
     for item in selection:
         # Finding the associated joint
         i_joint = 0
-        for _, _, node in robot_obj.tree:
-            type_, nb = node.name.split('_')
-            nb = int(nb)
+        for _, _, node in state.robot_obj.tree:
+            type_ = node._type
+            nb = node._nb
 
             if type_ == 'joint':
-                if robot_obj.joints[nb].name == item.text():
+                if state.robot_obj.joints[nb].name == item.text():
                     list_widget.takeItem(list_widget.row(item))
 
                     # Enabling the item in the combo box
@@ -212,9 +292,9 @@ def del_joint_from_list(list_widget, combo_box, add_btn, del_btn, forward):
                     add_btn.setEnabled(True)
 
                     if forward:
-                        ftm_list.remove("joint_" + str(nb))
+                        state.ftm_list.remove("joint_" + str(nb))
                     else:
-                        btm_list.remove("joint_" + str(nb))
+                        state.btm_list.remove("joint_" + str(nb))
 
                 i_joint += 1
 
@@ -362,7 +442,7 @@ def parse_content(content):
 
 # Add FK or Jacobian _________________________________________________________
 
-def add_fk_jac(ui, fk):
+def add_fk_jac(state, ui, fk):
     """
     Description
     -----------
@@ -372,6 +452,9 @@ def add_fk_jac(ui, fk):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     ui : main_window.Ui_MainWindow
         Current GUI
         
@@ -379,18 +462,6 @@ def add_fk_jac(ui, fk):
         True if the list to update is the Forward Kinematics list
         False if the list to update is the Jacobian matrices list
     
-    Global Variables Used
-    ---------------------
-    
-    fk_list : list of string
-        list of all the joints to generate the code
-    
-    jac_list : list of string
-        list of all the joints to generate the code
-    
-    robot_obj : robots.Robot
-        Robot Object
-    
     Returns
     -------
     
@@ -398,9 +469,6 @@ def add_fk_jac(ui, fk):
     
     """
 
-    global fk_list
-    global jac_list
-
     if fk:
         combo_box_o = ui.comboBox_fk_origin
         combo_box_d = ui.comboBox_fk_destination
@@ -423,16 +491,16 @@ def add_fk_jac(ui, fk):
 
     # Finding the corresponding object
     i = 0
-    for _, _, node in robot_obj.tree:
+    for _, _, node in state.robot_obj.tree:
         for od, ind in enumerate([ind_o, ind_d]):
             if i == ind:
-                type_, nb = node.name.split('_')
-                nb = int(nb)
+                type_ = node._type
+                nb = node._nb
 
                 if type_ == 'joint':
-                    names[od] = robot_obj.joints[nb].name
+                    names[od] = state.robot_obj.joints[nb].name
                 else:
-                    names[od] = robot_obj.links[nb].name
+                    names[od] = state.robot_obj.links[nb].name
 
                 ids[od] = node.name
                 continue
@@ -444,14 +512,17 @@ def add_fk_jac(ui, fk):
         return
     ids.append(content)
 
+    key = tuple(ids)
     if fk:
-        if ids in fk_list:
+        if key in state.fk_set:
             return
-        fk_list.append(ids)
+        state.fk_set.add(key)
+        state.fk_list.append(ids)
     else:
-        if ids in jac_list:
+        if key in state.jac_set:
             return
-        jac_list.append(ids)
+        state.jac_set.add(key)
+        state.jac_list.append(ids)
 
     list_widget.addItem(names[0] + '  ==>  ' + names[1] + ' ' +
                         parse_content(content))
@@ -459,7 +530,7 @@ def add_fk_jac(ui, fk):
 
 # Remove FK or Jacobian ______________________________________________________
 
-def del_fk_jac(list_widget, fk):
+def del_fk_jac(state, list_widget, fk):
     """
     Description
     -----------
@@ -469,6 +540,9 @@ def del_fk_jac(list_widget, fk):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     list_widget : PyQt5.QtWidgets.QListWidget
         List in which you want to remove the item
         
@@ -476,18 +550,6 @@ def del_fk_jac(list_widget, fk):
         True if the list to update is the Forward Kinematics list
         False if the list to update is the Jacobian matrices list
     
-    Global Variables Used
-    ---------------------
-    
-    fk_list : list of string
-        list of all the joints to generate the code
-    
-    jac_list : list of string
-        list of all the joints to generate the code
-    
-    robot_obj : robots.Robot
-        Robot Object
-    
     Returns
     -------
     
@@ -495,10 +557,6 @@ def del_fk_jac(list_widget, fk):
     
     """
 
-    global fk_list
-    global jac_list
-    global robot_obj
-
     # Getting the selected items
     selection = list_widget.selectedItems()
 
@@ -509,16 +567,16 @@ def del_fk_jac(list_widget, fk):
         list_widget.takeItem(index)
 
         if fk:
-            del fk_list[index]
-            print(fk_list)
+            state.fk_set.discard(tuple(state.fk_list.pop(index)))
+            print(state.fk_list)
         else:
-            del jac_list[index]
-            print(jac_list)
+            state.jac_set.discard(tuple(state.jac_list.pop(index)))
+            print(state.jac_list)
 
 
 # Add a center of mass _______________________________________________________
 
-def add_com(ui):
+def add_com(state, ui):
     """
     Description
     -----------
@@ -528,55 +586,47 @@ def add_com(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    com_list : list
-        list containing all the contents of the center of mass
-
     """
-    global com_list
 
     content = content_fk_jac_loops(ui, "com")
-    if content in com_list:
+    if content in state.com_list:
         return
-    com_list.append(content)
+    state.com_list.append(content)
     ui.listWidget_com.addItem(f"Center of Mass {parse_content(content)}")
 
 
 # Delete a CoM _______________________________________________________________
 
-def del_com(ui):
+def del_com(state, ui):
     """
     Remove all the selected coms from the list
 
     Parameters
     ----------
+    state : GuiState
+        State of the GUI
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    com_list : list
-        list containing all the contents of the center of mass
     """
-    global com_list
 
     # Getting the selected items
     selection = ui.listWidget_com.selectedItems()
     for item in selection:
         index = ui.listWidget_com.row(item)
         ui.listWidget_com.takeItem(index)
-        del com_list[index]
+        del state.com_list[index]
 
 
 # Add a center of mass _______________________________________________________
 
-def add_com_jac(ui):
+def add_com_jac(state, ui):
     """
     Description
     -----------
@@ -586,56 +636,48 @@ def add_com_jac(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    com_jac_list : list
-        list containing all the contents of the center of mass jacobians
-
     """
-    global com_jac_list
 
     content = content_fk_jac_loops(ui, "com_jac")
-    if content in com_jac_list:
+    if content in state.com_jac_list:
         return
-    com_jac_list.append(content)
+    state.com_jac_list.append(content)
     ui.listWidget_com_jac.addItem(f"Center of Mass Jacobian "
                                   f"{parse_content(content)}")
 
 
 # Delete a CoM _______________________________________________________________
 
-def del_com_jac(ui):
+def del_com_jac(state, ui):
     """
     Remove all the selected com jacobians from the list
 
     Parameters
     ----------
+    state : GuiState
+        State of the GUI
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    com_jac_list : list
-        list containing all the contents of the center of mass jacobians
     """
-    global com_jac_list
 
     # Getting the selected items
     selection = ui.listWidget_com_jac.selectedItems()
     for item in selection:
         index = ui.listWidget_com_jac.row(item)
         ui.listWidget_com_jac.takeItem(index)
-        del com_jac_list[index]
+        del state.com_jac_list[index]
 
 
 # Add a polynomial trajectory ________________________________________________
 
-def new_polynomial_trajectory(ui):
+def new_polynomial_trajectory(state, ui):
     """
     Description
     -----------
@@ -645,35 +687,12 @@ def new_polynomial_trajectory(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -681,12 +700,10 @@ def new_polynomial_trajectory(ui):
 
     """
 
-    global polynomial_trajectories
-
     # Finding a Name .........................................................
 
     k = 0
-    while "r" + str(k) in [t["name"] for t in polynomial_trajectories]:
+    while "r" + str(k) in [t["name"] for t in state.polynomial_trajectories]:
         k += 1
 
     trajectory = {"name": "r" + str(k),
@@ -702,7 +719,7 @@ def new_polynomial_trajectory(ui):
     item.setText(trajectory["name"])
     ui.listWidget_poly.addItem(item)
     ui.lineEdit_poly_fname.setText("r" + str(k))
-    polynomial_trajectories.append(trajectory)
+    state.polynomial_trajectories.append(trajectory)
     ui.listWidget_poly.setCurrentRow(ui.listWidget_poly.count() - 1)
     ui.lineEdit_poly_fname.setStyleSheet("color: #efefef;")
 
@@ -710,13 +727,13 @@ def new_polynomial_trajectory(ui):
 
     ui.comboBox_loops_trajectory.addItem(trajectory["name"])
 
-    if len(polynomial_trajectories) == 1:
+    if len(state.polynomial_trajectories) == 1:
         ui.pushButton_poly_del.setEnabled(True)
 
 
 # Remove polynomial trajectory _______________________________________________
 
-def del_polynomial_trajectory(ui):
+def del_polynomial_trajectory(state, ui):
     """
     Description
     -----------
@@ -726,35 +743,12 @@ def del_polynomial_trajectory(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -762,8 +756,6 @@ def del_polynomial_trajectory(ui):
 
     """
 
-    global polynomial_trajectories
-
     # Getting the selected items
     selection = ui.listWidget_poly.selectedItems()
 
@@ -772,15 +764,15 @@ def del_polynomial_trajectory(ui):
 
         ui.listWidget_poly.takeItem(index)
         ui.comboBox_loops_trajectory.removeItem(index + 1)
-        del polynomial_trajectories[index]
+        del state.polynomial_trajectories[index]
 
-    if not polynomial_trajectories:
+    if not state.polynomial_trajectories:
         ui.pushButton_poly_del.setEnabled(False)
 
 
 # Update trajectory name on text change ______________________________________
 
-def update_trajectory_name(ui):
+def update_trajectory_name(state, ui):
     """
     Description
     -----------
@@ -790,35 +782,12 @@ def update_trajectory_name(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -826,8 +795,6 @@ def update_trajectory_name(ui):
 
     """
 
-    global polynomial_trajectories
-
     selection = ui.listWidget_poly.selectedItems()
 
     index = None
@@ -858,7 +825,8 @@ def update_trajectory_name(ui):
 
     if content == "":
         k = 0
-        while "r" + str(k) in [t["name"] for t in polynomial_trajectories]:
+        while "r" + str(k) in [t["name"] for t in
+                                 state.polynomial_trajectories]:
             k += 1
         content = "r" + str(k)
 
@@ -871,8 +839,8 @@ def update_trajectory_name(ui):
 
     k = 0
     while content in [t["name"] for t in
-                      polynomial_trajectories[:index] +
-                      polynomial_trajectories[index+1:]]:
+                      state.polynomial_trajectories[:index] +
+                      state.polynomial_trajectories[index+1:]]:
         if k == 0:
             content += '_0'
         else:
@@ -891,12 +859,12 @@ def update_trajectory_name(ui):
     for item in selection:
         index = ui.listWidget_poly.row(item)
         item.setText(content)
-        polynomial_trajectories[index]["name"] = content
+        state.polynomial_trajectories[index]["name"] = content
 
 
 # Display conditions on item selected ________________________________________
 
-def display_trajectory_conditions(ui):
+def display_trajectory_conditions(state, ui):
     """
     Description
     -----------
@@ -909,35 +877,12 @@ def display_trajectory_conditions(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -951,8 +896,6 @@ def display_trajectory_conditions(ui):
 
     # Get the current selected item ..........................................
 
-    global polynomial_trajectories
-
     selection = ui.listWidget_poly.selectedItems()
 
     index = None
@@ -969,11 +912,12 @@ def display_trajectory_conditions(ui):
     if index is None:
         return
 
-    ui.lineEdit_poly_fname.setText(polynomial_trajectories[index]["name"])
+    ui.lineEdit_poly_fname\
+        .setText(state.polynomial_trajectories[index]["name"])
 
     # Fill content with conditions ...........................................
 
-    for condition in polynomial_trajectories[index]["conditions"]:
+    for condition in state.polynomial_trajectories[index]["conditions"]:
         pos = ui.tableWidget_poly_conditions.rowCount()
         ui.tableWidget_poly_conditions.insertRow(pos)
 
@@ -987,7 +931,7 @@ def display_trajectory_conditions(ui):
 
 # Add a condition to the selected polynomial trajectory ______________________
 
-def new_condition_polynomial_trajectory(ui):
+def new_condition_polynomial_trajectory(state, ui):
     """
     Description
     -----------
@@ -998,35 +942,12 @@ def new_condition_polynomial_trajectory(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -1045,8 +966,6 @@ def new_condition_polynomial_trajectory(ui):
 
     # Save to global variable ................................................
 
-    global polynomial_trajectories
-
     selection = ui.listWidget_poly.selectedItems()
 
     index = None
@@ -1055,12 +974,12 @@ def new_condition_polynomial_trajectory(ui):
     if index is None:
         return
 
-    polynomial_trajectories[index]["conditions"].append(["0", "0", "0"])
+    state.polynomial_trajectories[index]["conditions"].append(["0", "0", "0"])
 
 
 # Delete polynomial trajectory condition(s) __________________________________
 
-def delete_polynomial_trajectory_condition(ui):
+def delete_polynomial_trajectory_condition(state, ui):
     """
     Description
     -----------
@@ -1070,35 +989,12 @@ def delete_polynomial_trajectory_condition(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -1108,8 +1004,6 @@ def delete_polynomial_trajectory_condition(ui):
 
     # Get selected list item .................................................
 
-    global polynomial_trajectories
-
     selection = ui.listWidget_poly.selectedItems()
 
     index_list = None
@@ -1130,13 +1024,13 @@ def delete_polynomial_trajectory_condition(ui):
 
     rows.sort(reverse=True)
     for row in rows:
-        polynomial_trajectories[index_list]["conditions"].pop(row)
+        state.polynomial_trajectories[index_list]["conditions"].pop(row)
         ui.tableWidget_poly_conditions.removeRow(row)
 
 
 # Edit polynomial trajectory condition _______________________________________
 
-def edit_polynomial_trajectory_condition(ui):
+def edit_polynomial_trajectory_condition(state, ui):
     """
     Description
     -----------
@@ -1147,35 +1041,12 @@ def edit_polynomial_trajectory_condition(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    polynomial_trajectories : list of dict
-        list of all the polynomial trajectories to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"name": str : Name of the trajectory,
-
-         "conditions" : list of list of 3 str :
-
-            [..., [k, t, x], ...]
-
-            k : str representing an integer
-                Order  of  the  derivative.  If  the  time  is your derivative
-                variable  and  the function you  want to create describes your
-                position,  0 corresponds to the position, 1 to the speed, 2 to
-                the acceleration, 3 to the jerk and so on.
-            t : str representing a float or a symbol
-                Time value on which you want your condition to be set
-            x : str representing a float or a symbol
-                Value  of the  function  for  the  given  time.  This can be a
-                symbolic variable
-        }
-
     Returns
     -------
 
@@ -1188,8 +1059,6 @@ def edit_polynomial_trajectory_condition(ui):
 
     # Get selected list item .................................................
 
-    global polynomial_trajectories
-
     selection = ui.listWidget_poly.selectedItems()
 
     index_list = None
@@ -1250,12 +1119,12 @@ def edit_polynomial_trajectory_condition(ui):
     if content == "":
         content = "0"
 
-    polynomial_trajectories[index_list]["conditions"][row][col] = content
+    state.polynomial_trajectories[index_list]["conditions"][row][col] = content
 
 
 # Add a control loop _________________________________________________________
 
-def add_control_loop(ui):
+def add_control_loop(state, ui):
     """
     Description
     -----------
@@ -1266,35 +1135,12 @@ def add_control_loop(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui : main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    control_loops_list : list of dict
-        list of all the control_loops to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"type" : str
-            "effector" or "com" for task 1
-         "type_2" : str or None
-            "effector" or "com" or None for task 2
-         "ids" : list of str
-            Origin, destination and content for task 1
-         "ids_2" : list of str
-            Origin, destination and content for task 2
-         "trajectory" : str
-            Polynomial trajectory used
-         "control_type" : str
-            "geometric", "positions" or "velocities"
-         "coppelia" : bool
-            True if coppelia sim support is enabled
-         "constraints" : bool
-            True if the constraints are enabled
-        }
-
     Returns
     -------
 
@@ -1319,16 +1165,16 @@ def add_control_loop(ui):
         ids = [0, 0]
         # Finding the corresponding object
         i = 0
-        for _, _, node in robot_obj.tree:
+        for _, _, node in state.robot_obj.tree:
             for od, ind in enumerate([ind_o, ind_d]):
                 if i == ind:
-                    type_, nb = node.name.split('_')
-                    nb = int(nb)
+                    type_ = node._type
+                    nb = node._nb
 
                     if type_ == 'joint':
-                        names[od] = robot_obj.joints[nb].name
+                        names[od] = state.robot_obj.joints[nb].name
                     else:
-                        names[od] = robot_obj.links[nb].name
+                        names[od] = state.robot_obj.links[nb].name
 
                     ids[od] = names[od]
                     continue
@@ -1359,16 +1205,16 @@ def add_control_loop(ui):
         ids = [0, 0]
         # Finding the corresponding object
         i = 0
-        for _, _, node in robot_obj.tree:
+        for _, _, node in state.robot_obj.tree:
             for od, ind in enumerate([ind_o, ind_d]):
                 if i == ind:
-                    type_, nb = node.name.split('_')
-                    nb = int(nb)
+                    type_ = node._type
+                    nb = node._nb
 
                     if type_ == 'joint':
-                        names[od] = robot_obj.joints[nb].name
+                        names[od] = state.robot_obj.joints[nb].name
                     else:
-                        names[od] = robot_obj.links[nb].name
+                        names[od] = state.robot_obj.links[nb].name
 
                     ids[od] = names[od]
                     continue
@@ -1400,7 +1246,7 @@ def add_control_loop(ui):
     loop["coppelia"] = ui.checkBox_loops_coppelia.isChecked()
     loop["constraints"] = ui.checkBox_loops_constraints.isChecked()
 
-    if loop in control_loops_list:
+    if loop in state.control_loops_list:
         return
 
     text += (f"  -  {loop['trajectory']}  -  {loop['control_type']}"
@@ -1408,13 +1254,13 @@ def add_control_loop(ui):
              f"{'  -  Constraints' if loop['constraints'] else ''}")
 
     ui.listWidget_loops.addItem(text)
-    control_loops_list.append(loop)
+    state.control_loops_list.append(loop)
     print(loop)
 
 
 # Delete a control loop ______________________________________________________
 
-def del_control_loop(ui):
+def del_control_loop(state, ui):
     """
     Description
     -----------
@@ -1424,35 +1270,12 @@ def del_control_loop(ui):
     Parameters
     ----------
 
+    state : GuiState
+        State of the GUI
+
     ui :  main_window.Ui_MainWindow
         GUI to update
 
-    Global Variables Used
-    ---------------------
-
-    control_loops_list : list of dict
-        list of all the control_loops to generate.
-
-        Every item of this list must be a dict with the following structure :
-
-        {"type" : str
-            "effector" or "com" for task 1
-         "type_2" : str or None
-            "effector" or "com" or None for task 2
-         "ids" : list of str
-            Origin, destination and content for task 1
-         "ids_2" : list of str
-            Origin, destination and content for task 2
-         "trajectory" : str
-            Polynomial trajectory used
-         "control_type" : str
-            "geometric", "positions" or "velocities"
-         "coppelia" : bool
-            True if coppelia sim support is enabled
-         "constraints" : bool
-            True if the constraints are enabled
-        }
-
     Returns
     -------
 
@@ -1460,8 +1283,6 @@ def del_control_loop(ui):
 
     """
 
-    global control_loops_list
-
     # Getting the selected items
     selection = ui.listWidget_loops.selectedItems()
 
@@ -1471,8 +1292,8 @@ def del_control_loop(ui):
 
         ui.listWidget_loops.takeItem(index)
 
-        del control_loops_list[index]
-        print(control_loops_list)
+        del state.control_loops_list[index]
+        print(state.control_loops_list)
 
 
 # Disable loops RPY when COM is selected _____________________________________
@@ -1550,7 +1371,7 @@ def disable_loops_rpy(ui, tab):
 
 # Update GUI State from Robot Object _________________________________________
 
-def init_gui_from_robot(gui, robot):
+def init_gui_from_robot(state, gui, robot):
     """
     Description
     -----------
@@ -1560,33 +1381,15 @@ def init_gui_from_robot(gui, robot):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     gui : main_window.Ui_MainWindow
         GUI to update
     
     robot : robots.Robot
         Robot Object to update the GUI
     
-    Global Variables Used
-    ---------------------
-    
-    ftm_list : list of string
-        list of all the joints to generate the code
-    
-    btm_list : list of string
-        list of all the joints to generate the code
-    
-    fk_list : list of string
-        List of all the forward kinematics to generate
-    
-    jac_list : list of string
-        List of all the jacobians
-
-    com_list : list of str
-        Contents of the coms
-
-    com_jac_list : list of str
-        Contents of the com jacobians
-    
     Returns
     -------
     
@@ -1594,13 +1397,12 @@ def init_gui_from_robot(gui, robot):
     
     """
 
-    global ftm_list  # Forward transition matrices list
-    global btm_list  # Backward transition matrices list
-    global fk_list
-    global jac_list
-    global com_list
-    global com_jac_list
-    global polynomial_trajectories
+    # Parsing the tree nodes names once ("joint_k" or "link_k") ..............
+
+    for _, _, node in robot.tree:
+        type_, nb = node.name.split('_')
+        node._type = type_
+        node._nb = int(nb)
 
     # Robot Information ......................................................
 
@@ -1630,8 +1432,9 @@ def init_gui_from_robot(gui, robot):
 
     # Tree Representation ....................................................
 
+    gui.treeWidget_info.setUpdatesEnabled(False)
     gui.treeWidget_info.clear()
-    gui.treeWidget_info.setHeaderLabels(['Name', 'Type'])
+    gui.treeWidget_info.setUniformRowHeights(True)
 
     list_items = []
     list_nodes = []
@@ -1650,8 +1453,8 @@ def init_gui_from_robot(gui, robot):
         item = QTreeWidgetItem(parent)
 
         # Text
-        type_, nb = node.name.split('_')
-        nb = int(nb)
+        type_ = node._type
+        nb = node._nb
 
         if type_ == 'joint':
             text = robot.joints[nb].name
@@ -1670,6 +1473,9 @@ def init_gui_from_robot(gui, robot):
         # Expand the whole tree
         gui.treeWidget_info.expandItem(item)
 
+    gui.treeWidget_info.setHeaderLabels(['Name', 'Type'])
+    gui.treeWidget_info.setUpdatesEnabled(True)
+
     gui.checkBox_fk_x.setChecked(True)
     gui.checkBox_fk_y.setChecked(True)
     gui.checkBox_fk_z.setChecked(True)
@@ -1689,8 +1495,8 @@ def init_gui_from_robot(gui, robot):
 
     # Transition Matrices ....................................................
 
-    ftm_list = []  # Forward transition matrices list
-    btm_list = []  # Backward transition matrices list
+    state.ftm_list = []  # Forward transition matrices list
+    state.btm_list = []  # Backward transition matrices list
 
     # Adding each matrix to both lists
     gui.listWidget_ftm.clear()
@@ -1700,8 +1506,8 @@ def init_gui_from_robot(gui, robot):
     i = 0
     for pre, _, node in robot.tree:
         # Text
-        type_, nb = node.name.split('_')
-        nb = int(nb)
+        type_ = node._type
+        nb = node._nb
 
         if type_ == 'joint':
             text = robot.joints[nb].name
@@ -1715,8 +1521,8 @@ def init_gui_from_robot(gui, robot):
             gui.comboBox_ftm_joint.model().item(i).setEnabled(False)
             gui.comboBox_btm_joint.model().item(i).setEnabled(False)
 
-            ftm_list.append('joint_' + str(i))
-            btm_list.append('joint_' + str(i))
+            state.ftm_list.append('joint_' + str(i))
+            state.btm_list.append('joint_' + str(i))
             i += 1
 
     gui.pushButton_ftm_add.setEnabled(False)
@@ -1724,8 +1530,10 @@ def init_gui_from_robot(gui, robot):
 
     # Froward Kinematics and Jacobians .......................................
 
-    fk_list = []
-    jac_list = []
+    state.fk_list = []
+    state.jac_list = []
+    state.fk_set = set()
+    state.jac_set = set()
 
     gui.listWidget_fk.clear()
     gui.listWidget_jac.clear()
@@ -1743,14 +1551,14 @@ def init_gui_from_robot(gui, robot):
     for pre, _, node in robot.tree:
 
         # Text
-        type_, nb = node.name.split('_')
-        nb = int(nb)
+        type_ = node._type
+        nb = node._nb
 
         if node.is_root:
-            all_roots.append(node.name)
+            all_roots.append(node)
 
         if node.is_leaf:
-            all_leaves.append(node.name)
+            all_leaves.append(node)
 
         # Combo boxes
         if type_ == 'joint':
@@ -1768,22 +1576,20 @@ def init_gui_from_robot(gui, robot):
         gui.comboBox_loops_destination_2.addItem(pre + name)
 
     for root in all_roots:
-        root_type, rnb = root.split('_')
-        rnb = int(rnb)
-        if root_type == 'joint':
-            root_name = robot.joints[rnb].name
+        if root._type == 'joint':
+            root_name = robot.joints[root._nb].name
         else:
-            root_name = robot.links[rnb].name
+            root_name = robot.links[root._nb].name
 
         for leaf in all_leaves:
-            fk_list.append([root, leaf, 'xyzo'])
-            jac_list.append([root, leaf, 'xyzrpY'])
-            leaf_type, lnb = leaf.split('_')
-            lnb = int(lnb)
-            if leaf_type == 'joint':
-                leaf_name = robot.joints[lnb].name
+            state.fk_list.append([root.name, leaf.name, 'xyzo'])
+            state.jac_list.append([root.name, leaf.name, 'xyzrpY'])
+            state.fk_set.add((root.name, leaf.name, 'xyzo'))
+            state.jac_set.add((root.name, leaf.name, 'xyzrpY'))
+            if leaf._type == 'joint':
+                leaf_name = robot.joints[leaf._nb].name
             else:
-                leaf_name = robot.links[lnb].name
+                leaf_name = robot.links[leaf._nb].name
 
             gui.listWidget_fk.addItem(root_name + '  ==>  ' + leaf_name +
                                       ' ' + parse_content('xyzo'))
@@ -1803,12 +1609,12 @@ def init_gui_from_robot(gui, robot):
     satus_ = robot.mass > 0
     if satus_:
         gui.listWidget_com.addItem("Center of Mass (x, y, z)")
-        com_list = ["xyz"]
+        state.com_list = ["xyz"]
         gui.listWidget_com_jac.addItem("Center of Mass Jacobian (x, y, z)")
-        com_jac_list = ["xyz"]
+        state.com_jac_list = ["xyz"]
     else:
-        com_list = []
-        com_jac_list = []
+        state.com_list = []
+        state.com_jac_list = []
     gui.checkBox_com.setChecked(satus_)
     gui.checkBox_com_x.setChecked(satus_)
     gui.checkBox_com_y.setChecked(satus_)
@@ -1835,7 +1641,7 @@ def init_gui_from_robot(gui, robot):
 
     # Polynomial Trajectories ................................................
 
-    polynomial_trajectories = [{"name": "r",
+    state.polynomial_trajectories = [{"name": "r",
                                 "conditions": [["0", "0", "0"],
                                                ["0", "tf", "1"],
                                                ["1", "0", "0"],
@@ -1855,7 +1661,7 @@ def init_gui_from_robot(gui, robot):
     gui.lineEdit_poly_fname.setEnabled(True)
 
     gui.lineEdit_fname.setText(robot.name)
-    update_settings(gui)
+    update_settings(state, gui)
 
     gui.pushButton_generate.setEnabled(True)
 
@@ -1879,7 +1685,7 @@ def init_gui_from_robot(gui, robot):
 
 # Open a file dialog _________________________________________________________
 
-def open_file_dialog(gui, progress_bar):
+def open_file_dialog(state, gui, progress_bar):
     """
     Description
     -----------
@@ -1889,6 +1695,9 @@ def open_file_dialog(gui, progress_bar):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     gui : main_window.Ui_MainWindow
         GUI to update after the file is opened
     
@@ -1911,20 +1720,19 @@ def open_file_dialog(gui, progress_bar):
                          directory=path + '../Examples')
     if fname == '':
         return
-    global robot_obj
     # Open the file
     if fname.split(".")[-1].lower() == "urdf":
         with open(fname) as file:
             urdf_obj = URDF.URDF(file)
-            robot_obj = cr.RobotURDF(urdf_obj, progress_bar)
+            state.robot_obj = cr.RobotURDF(urdf_obj, progress_bar)
 
     elif fname.split(".")[-1].lower() == "dhparams":
         dh_obj = dh(fname)
-        robot_obj = cr.RobotDH(dh_obj)
-    init_gui_from_robot(gui, robot_obj)
+        state.robot_obj = cr.RobotDH(dh_obj)
+    init_gui_from_robot(state, gui, state.robot_obj)
 
 
-def update_settings(gui):
+def update_settings(state, gui):
     """
     Description
     -----------
@@ -1934,24 +1742,21 @@ def update_settings(gui):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     gui : main_window.Ui_MainWindow
         GUI to update
         
-    Global Variable Used
-    --------------------
-    
-    settings : dict
-        Dictionary of the settings
-    
     """
 
-    settings["filename"] = gui.lineEdit_fname.text()
+    state.settings["filename"] = gui.lineEdit_fname.text()
     ind = gui.comboBox_language.currentIndex()
-    settings["language"] = gui.comboBox_language.itemText(ind)
-    settings["optimization_level"] = gui.comboBox_optimization_level\
+    state.settings["language"] = gui.comboBox_language.itemText(ind)
+    state.settings["optimization_level"] = gui.comboBox_optimization_level\
         .currentIndex()
 
-    if settings["optimization_level"] <= 0:
+    if state.settings["optimization_level"] <= 0:
         gui.checkBox_fk_x.setChecked(True)
         gui.checkBox_fk_y.setChecked(True)
         gui.checkBox_fk_z.setChecked(True)
@@ -1969,30 +1774,30 @@ def update_settings(gui):
         gui.checkBox_com_jac_y.setChecked(True)
         gui.checkBox_com_jac_z.setChecked(True)
 
-    gui.checkBox_fk_x.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_fk_y.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_fk_z.setEnabled(settings["optimization_level"] > 0)
+    gui.checkBox_fk_x.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_fk_y.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_fk_z.setEnabled(state.settings["optimization_level"] > 0)
     gui.checkBox_fk_orientation\
-        .setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_x.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_y.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_z.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_wx.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_wy.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_jac_wz.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_x.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_y.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_z.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_jac_x.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_jac_y.setEnabled(settings["optimization_level"] > 0)
-    gui.checkBox_com_jac_z.setEnabled(settings["optimization_level"] > 0)
-
-    mat = settings["language"].lower() == "matlab"
+        .setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_x.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_y.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_z.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_wx.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_wy.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_jac_wz.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_x.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_y.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_z.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_jac_x.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_jac_y.setEnabled(state.settings["optimization_level"] > 0)
+    gui.checkBox_com_jac_z.setEnabled(state.settings["optimization_level"] > 0)
+
+    mat = state.settings["language"].lower() == "matlab"
     gui.checkBox_loops_constraints.setEnabled(mat)
     gui.checkBox_loops_constraints.setChecked(mat)
 
 
-def generate(gui):
+def generate(state, gui):
     """
     Description
     -----------
@@ -2002,30 +1807,12 @@ def generate(gui):
     Parameters
     ----------
     
+    state : GuiState
+        State of the GUI
+    
     gui : main_window.Ui_MainWindow
         GUI to update
         
-    Global Variables Used
-    ---------------------
-    
-    robot_obj : robots.Robot
-        Robot object
-    
-    ftm_list : list of string
-        list of all the joints to generate the code
-    
-    btm_list : list of string
-        list of all the joints to generate the code
-    
-    fk_list : list of string
-        List of all the forward kinematics to generate
-    
-    jac_list : list of string
-        List of all the jacobians
-    
-    settings : dict
-        Dictionnary of the settings for the code generation
-    
     Returns
     -------
     
@@ -2033,31 +1820,23 @@ def generate(gui):
     
     """
 
-    global robot_obj
-    global ftm_list
-    global btm_list
-    global fk_list
-    global jac_list
-    global com_list
-    global com_jac_list
-
-    ftm = ftm_list if gui.checkBox_ftm.isChecked() else []
-    btm = btm_list if gui.checkBox_btm.isChecked() else []
-    fk = fk_list if gui.checkBox_fk.isChecked() else []
-    jac = jac_list if gui.checkBox_jac.isChecked() else []
-    com = com_list if gui.checkBox_com.isChecked() else []
-    com_jac = com_jac_list if gui.checkBox_com_jac.isChecked() else []
-
-    language = Language(settings["language"])
-    optimization_level = settings["optimization_level"]
-
-    generate_everything(robot_obj, ftm, btm,
+    ftm = state.ftm_list if gui.checkBox_ftm.isChecked() else []
+    btm = state.btm_list if gui.checkBox_btm.isChecked() else []
+    fk = state.fk_list if gui.checkBox_fk.isChecked() else []
+    jac = state.jac_list if gui.checkBox_jac.isChecked() else []
+    com = state.com_list if gui.checkBox_com.isChecked() else []
+    com_jac = state.com_jac_list if gui.checkBox_com_jac.isChecked() else []
+
+    language = Language(state.settings["language"])
+    optimization_level = state.settings["optimization_level"]
+
+    generate_everything(state.robot_obj, ftm, btm,
                         fk, jac, com, com_jac,
-                        polynomial_trajectories,
-                        control_loops_list,
+                        state.polynomial_trajectories,
+                        state.control_loops_list,
                         optimization_level,
                         language,
-                        path + '../generated/' + settings["filename"],
+                        path + '../generated/' + state.settings["filename"],
                         progressbar=gui.progressBar)
 
 
@@ -2072,7 +1851,7 @@ def main():
     myappid = u'teskann.urdfast.1.0'  # arbitrary string
     ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
-    global path
+    global path, _STYLESHEET
 
     logging.basicConfig(level=logging.DEBUG)
     # create the application and the main window
@@ -2084,36 +1863,28 @@ def main():
     ui = main_window.Ui_MainWindow()
     ui.setupUi(window)
 
+    # GUI state shared by all the callbacks
+    state = GuiState()
+
     # Actions ................................................................
 
     ui.actionOpen.triggered.connect(lambda:
-                                    open_file_dialog(ui, ui.progressBar))
+                                    open_file_dialog(state, ui,
+                                                     ui.progressBar))
 
     ui.actionClose.triggered.connect(window.close)
 
-    link_str = "https://github.com/Teskann/NYXX/blob/master/documentation" + \
-               "/usermanual.md"
-
-    ui.actionDocumentation.triggered.connect(lambda:
-                                             QDesktopServices.openUrl(
-                                                 QUrl(link_str)))
-
-    link_str2 = "https://github.com/Teskann/NYXX"
-
-    ui.actionView_Github.triggered.connect(lambda:
-                                           QDesktopServices.openUrl(
-                                               QUrl(link_str2)))
-
-    link_str3 = "https://github.com/Teskann/NYXX/issues/new"
-
-    ui.actionReport_a_Bug.triggered.connect(lambda:
-                                            QDesktopServices.openUrl(
-                                                QUrl(link_str3)))
+    ui.actionDocumentation.triggered.connect(
+        lambda: QDesktopServices.openUrl(_DOC_URL))
+    ui.actionView_Github.triggered.connect(
+        lambda: QDesktopServices.openUrl(_GH_URL))
+    ui.actionReport_a_Bug.triggered.connect(
+        lambda: QDesktopServices.openUrl(_BUG_URL))
 
     # Opening button .........................................................
 
     ui.pushButton.clicked.connect(
-        lambda: open_file_dialog(ui, ui.progressBar))
+        lambda: open_file_dialog(state, ui, ui.progressBar))
 
     # Transition Matrices ....................................................
 
@@ -2121,7 +1892,7 @@ def main():
 
     ui.pushButton_ftm_add.clicked \
         .connect(lambda:
-                 add_joint_to_list(ui.listWidget_ftm,
+                 add_joint_to_list(state, ui.listWidget_ftm,
                                    ui.comboBox_ftm_joint,
                                    ui.pushButton_ftm_add,
                                    ui.pushButton_ftm_del,
@@ -2130,6 +1901,7 @@ def main():
     ui.pushButton_ftm_del.clicked \
         .connect(lambda:
                  del_joint_from_list(
+                     state,
                      ui.listWidget_ftm,
                      ui.comboBox_ftm_joint,
                      ui.pushButton_ftm_add,
@@ -2137,7 +1909,7 @@ def main():
 
     ui.pushButton_btm_add.clicked \
         .connect(lambda:
-                 add_joint_to_list(ui.listWidget_btm,
+                 add_joint_to_list(state, ui.listWidget_btm,
                                    ui.comboBox_btm_joint,
                                    ui.pushButton_btm_add,
                                    ui.pushButton_btm_del,
@@ -2146,6 +1918,7 @@ def main():
     ui.pushButton_btm_del.clicked \
         .connect(lambda:
                  del_joint_from_list(
+                     state,
                      ui.listWidget_btm,
                      ui.comboBox_btm_joint,
                      ui.pushButton_btm_add,
@@ -2154,30 +1927,30 @@ def main():
     # Forward Kinematics .....................................................
 
     ui.pushButton_fk_add.clicked \
-        .connect(lambda: add_fk_jac(ui, True))
+        .connect(lambda: add_fk_jac(state, ui, True))
 
     ui.pushButton_fk_del.clicked \
         .connect(lambda:
-                 del_fk_jac(ui.listWidget_fk, True))
+                 del_fk_jac(state, ui.listWidget_fk, True))
 
     # Jacobians ..............................................................
 
     ui.pushButton_jac_add.clicked \
-        .connect(lambda: add_fk_jac(ui, False))
+        .connect(lambda: add_fk_jac(state, ui, False))
     ui.pushButton_jac_del.clicked \
         .connect(lambda:
-                 del_fk_jac(ui.listWidget_jac,
+                 del_fk_jac(state, ui.listWidget_jac,
                             False))
 
     # CoM ....................................................................
 
-    ui.pushButton_add_com.clicked.connect(lambda: add_com(ui))
-    ui.pushButton_del_com.clicked.connect(lambda: del_com(ui))
+    ui.pushButton_add_com.clicked.connect(lambda: add_com(state, ui))
+    ui.pushButton_del_com.clicked.connect(lambda: del_com(state, ui))
 
     # CoM Jacobians ..........................................................
 
-    ui.pushButton_add_com_jac.clicked.connect(lambda: add_com_jac(ui))
-    ui.pushButton_del_com_jac.clicked.connect(lambda: del_com_jac(ui))
+    ui.pushButton_add_com_jac.clicked.connect(lambda: add_com_jac(state, ui))
+    ui.pushButton_del_com_jac.clicked.connect(lambda: del_com_jac(state, ui))
 
     # Polynomial Trajectories ................................................
 
@@ -2190,25 +1963,27 @@ def main():
     ui.lineEdit_poly_fname.setEnabled(False)
 
     ui.pushButton_poly_new_traj.clicked \
-        .connect(lambda: new_polynomial_trajectory(ui))
+        .connect(lambda: new_polynomial_trajectory(state, ui))
 
     ui.pushButton_poly_del.clicked \
-        .connect(lambda: del_polynomial_trajectory(ui))
+        .connect(lambda: del_polynomial_trajectory(state, ui))
 
     ui.lineEdit_poly_fname.textChanged \
-        .connect(lambda: update_trajectory_name(ui))
+        .connect(lambda: update_trajectory_name(state, ui))
 
     ui.listWidget_poly.itemSelectionChanged \
-        .connect(lambda: display_trajectory_conditions(ui))
+        .connect(lambda: display_trajectory_conditions(state, ui))
 
     ui.pushButton_poly_new_condition \
-        .clicked.connect(lambda: new_condition_polynomial_trajectory(ui))
+        .clicked.connect(lambda: new_condition_polynomial_trajectory(state,
+                                                                     ui))
 
     ui.pushButton_poly_del_condition \
-        .clicked.connect(lambda: delete_polynomial_trajectory_condition(ui))
+        .clicked.connect(lambda: delete_polynomial_trajectory_condition(state,
+                                                                        ui))
 
-    ui.tableWidget_poly_conditions\
-        .itemChanged.connect(lambda: edit_polynomial_trajectory_condition(ui))
+    ui.tableWidget_poly_conditions.itemChanged \
+        .connect(lambda: edit_polynomial_trajectory_condition(state, ui))
 
     # Control Loops ..........................................................
 
@@ -2217,8 +1992,10 @@ def main():
         .connect(lambda : disable_loops_rpy(ui, 2))
     ui.radioButton_loops_none_2.toggled \
         .connect(lambda: disable_loops_rpy(ui, 2))
-    ui.pushButton_loops_add.clicked.connect(lambda: add_control_loop(ui))
-    ui.pushButton_loops_del.clicked.connect(lambda: del_control_loop(ui))
+    ui.pushButton_loops_add.clicked\
+        .connect(lambda: add_control_loop(state, ui))
+    ui.pushButton_loops_del.clicked\
+        .connect(lambda: del_control_loop(state, ui))
 
     # Font ...................................................................
 
@@ -2227,18 +2004,19 @@ def main():
 
     # Settings apply .........................................................
 
-    ui.pushButton_2.clicked.connect(lambda: update_settings(ui))
+    ui.pushButton_2.clicked.connect(lambda: update_settings(state, ui))
 
     # Generate Button ........................................................
 
-    ui.pushButton_generate.clicked.connect(lambda: generate(ui))
+    ui.pushButton_generate.clicked.connect(lambda: generate(state, ui))
     ui.pushButton_generate.setEnabled(False)
     ui.comboBox_optimization_level.setCurrentIndex(2)
 
     # setup stylesheet
-    file = open(path + "dark.qss")
-    app.setStyleSheet(file.read())
-    file.close()
+    if _STYLESHEET is None:
+        with open(path + "dark.qss") as file:
+            _STYLESHEET = file.read()
+    app.setStyleSheet(_STYLESHEET)
 
     # auto quit after 2s when testing on travis-ci
     if "--travis" in sys.argv:
@@ -4,12 +4,22 @@ Created on Mon Jun 29 10:19:19 2020
 
 @author: Clément
 """
+from functools import lru_cache
+
 from sympy import Symbol
 
-from code_optimization import replace, replace_var, replace_many
+from code_optimization import replace, replace_many, convert_all_sci_to_dbl
 import re
 
+# Matrix labels (#mat#nb_lines#nb_columns#elem_1#...#elem_n#endmat&)
+_MAT_LABEL_RE = re.compile(r'(?:^|(?<=(\W)))#mat#([\w\-.*/+()\[\],:]+#)+'
+                           r'endmat&(?:$|(?:(\W)))')
+
+# Characters without which an expression has no operation nor function call
+_OP_CHARS = frozenset('+-*@/([')
+
 
+@lru_cache(maxsize=None)
 def indent(number):
     """
     Description
@@ -37,12 +47,7 @@ def indent(number):
     
     """
 
-    ind = ''
-
-    for _ in range(number):
-        ind += '    '
-
-    return ind
+    return '    ' * number
 
 
 # Language object ____________________________________________________________
@@ -197,11 +202,205 @@ class Language:
     break_ : str
         Break statement (to break a for/while loop).
 
+    use_numba : bool
+        True  if  the  matrix functions are compiled with numba (Python only,
+        see generate_fct)
+
+    use_cython : bool
+        True  if  the  generated  file  is  a Cython module (.pyx) with typed
+        matrix functions (Python only, see generate_fct)
+
+    use_jax : bool
+        True  if  the  generated  Python  code  uses  jax.numpy  instead of
+        numpy and math
+
+    batched : bool
+        True if the matrix functions evaluate a whole batch of parameters at
+        once (Python only, see generate_fct)
+
+    cache_key : tuple
+        Name  and  options  of  the  language.  Two  languages with the same
+        cache_key generate the same code.
+
     """
 
+    # Attributes =============================================================
+
+    __slots__ = ('name', 'fct_prefix', 'fct_suffix', 'fct_end',
+                 'param_separator', 'max_line_length', 'comment_line',
+                 'comment_par_beg', 'comment_par_end', 'indexing_0',
+                 'end_of_line', 'is_typed', 'double_type', 'vector_type',
+                 'matrix_type', 'can_return_list', 'operators', 'fcts',
+                 'docstr_before', 'extension', 'mat_obj_start', 'mat_obj_end',
+                 'mat_col_separator', 'mat_line_separator', 'mat_new_line',
+                 'header', 'subscription', 'return_', 'end_loop', 'time_start',
+                 'time_dt', 'while_', 'if_', 'break_', 'use_numba',
+                 'use_cython', 'use_jax', 'batched', 'cache_key',
+                 '_op_keys',
+                 '_op_new', '_fct_patterns', '_convert_cache',
+                 '_mat_templates', '_type_map')
+
+    # Languages configurations ===============================================
+
+    _CONFIGS = {
+        # Python .............................................................
+
+        'python': {
+            'name': 'python',
+            'fct_prefix': "def _fname_(",
+            'fct_suffix': "):",
+            'fct_end': "",
+            'param_separator': ",",
+            'max_line_length': 79,
+            'comment_line': "#",
+            'comment_par_beg': '"""',
+            'comment_par_end': '"""',
+            'indexing_0': 0,
+            'end_of_line': '',
+            'is_typed': False,
+            'double_type': 'float',
+            'vector_type': 'numpy.ndarray',
+            'matrix_type': 'numpy.ndarray',
+            'can_return_list': True,
+            'operators': {'**': ['**', False],
+                          '*':  ['*', False],
+                          '@':  ['dot', True],
+                          '/':  ['/', False],
+                          '+':  ['+', False],
+                          '-':  ['-', False],
+                          "[]": ["[]", True]},
+            'fcts': {'eye': 'eye(__param1__, __param2__)',
+                     'zeros': 'zeros((__param1__, __param2__))',
+                     'cross': 'cross(__param1__, __param2__)',
+                     'vcat': 'vstack((__param1__, __param2__))',
+                     'pluseq': '__param1__ += __param2__',
+                     'matinv': 'inv(__param1__)'},
+            'docstr_before': False,
+            'extension': 'py',
+            'mat_obj_start': 'array([',
+            'mat_obj_end': '])',
+            'mat_col_separator': ',',
+            'mat_line_separator': ',',
+            'mat_new_line': ['[', ']'],
+            'header': "from math import cos, sin, acos, abs"
+                      "\nfrom numpy import vstack, "
+                      "array, cross, dot, zeros, eye, transpose, norm"
+                      "\nfrom numpy.linalg import inv, pinv"
+                      "\nimport time",
+            'subscription': 1,
+            'return_': "return",
+            'end_loop': "",
+            'time_start': "start = time.time()",
+            'time_dt': "dt = time.time() - start",
+            'while_': "while __COND__:",
+            'if_': "if __COND__:",
+            'break_': "break",
+        },
+
+        # Julia ..............................................................
+
+        'julia': {
+            'name': 'julia',
+            'fct_prefix': "function _fname_(",
+            'fct_suffix': ")",
+            'fct_end': "end",
+            'param_separator': ",",
+            'max_line_length': 92,
+            'comment_line': "#",
+            'comment_par_beg': '"""',
+            'comment_par_end': '"""',
+            'indexing_0': 1,
+            'end_of_line': '',
+            'is_typed': False,
+            'double_type': 'Float64',
+            'vector_type': 'Vector',
+            'matrix_type': 'Matrix',
+            'can_return_list': True,
+            'operators': {'**': ['^', False],
+                          '*': ['*', False],
+                          '@': ['*', False],
+                          '/': ['/', False],
+                          '+': ['+', False],
+                          '-': ['-', False],
+                          '[]': ['[]', True]},
+            'fcts': {'eye': 'Matrix(I,__param1__, __param2__)',
+                     'zeros': 'zeros(__param1__, __param2__)',
+                     'cross': 'cross(__param1__, __param2__)',
+                     'vcat': 'vcat(__param1__, __param2__)',
+                     'pluseq': '__param1__ += __param2__',
+                     'matinv': 'inv(__param1__)'},
+            'docstr_before': True,
+            'extension': 'jl',
+            'mat_obj_start': 'vcat(',
+            'mat_obj_end': ')',
+            'mat_col_separator': ' ',
+            'mat_line_separator': ',',
+            'mat_new_line': ['[', ']'],
+            'header': "using LinearAlgebra\n",
+            'subscription': 0,
+            'return_': "return",
+            'end_loop': "end",
+            'time_start': "start = time();",
+            'time_dt': "dt = time() - start;",
+            'while_': "while __COND__",
+            'if_': "if __COND__",
+            'break_': "break",
+        },
+
+        # MATLAB .............................................................
+
+        'matlab': {
+            'name': 'matlab',
+            'fct_prefix': "function return_value = _fname_(",
+            'fct_suffix': ")",
+            'fct_end': "end",
+            'param_separator': ",",
+            'max_line_length': 75,
+            'comment_line': "%",
+            'comment_par_beg': '%{\n',
+            'comment_par_end': '\n%}',
+            'indexing_0': 1,
+            'end_of_line': ';',
+            'is_typed': False,
+            'double_type': 'double',
+            'vector_type': 'double',
+            'matrix_type': 'double',
+            'can_return_list': True,
+            'operators': {'**': ['.^', False],
+                          '*': ['.*', False],
+                          '@': ['*', False],
+                          '/': ['./', False],
+                          '+': ['+', False],
+                          '-': ['-', False],
+                          '[]': ['()', True]},
+            'fcts': {'eye': 'eye(__param1__, __param2__)',
+                     'zeros': 'zeros(__param1__, __param2__)',
+                     'cross': 'cross(__param1__, __param2__)',
+                     'vcat': "[__param1__; __param2__]",
+                     'pluseq': '__param1__ = __param1__ + __param2__',
+                     'matinv': 'inv(__param1__)'},
+            'docstr_before': False,
+            'extension': 'm',
+            'mat_obj_start': '[',
+            'mat_obj_end': ']',
+            'mat_col_separator': ',',
+            'mat_line_separator': ';',
+            'mat_new_line': ['', ''],
+            'header': "",
+            'subscription': 0,
+            'return_': "return_value =",
+            'end_loop': "end",
+            'time_start': "start = tic;",
+            'time_dt': "dt = toc(start);",
+            'while_': "while __COND__",
+            'if_': "if __COND__",
+            'break_': "break",
+        },
+    }
+
     # Constructor ============================================================
 
-    def __init__(self, name):
+    def __init__(self, name, use_numba=False, batched=False):
         """
         Description
         -----------
@@ -212,169 +411,128 @@ class Language:
         ----------
         
         name : str
-            Function Name. Not case sensitive
+            Function Name. Not case sensitive. 'python_numba' is the same as
+            'python' with use_numba=True. 'cython' generates a Cython module :
+            Python code where the matrix functions have typed variables.
+            'jax'  generates  Python  code  using  jax.numpy,  the  matrix
+            functions  (pure  functions  of  their  parameters) can then be
+            transformed by jax.jit and jax.vmap. Use an optimization level of
+            at least 1 with jax : the level 0 functions modify arrays in place
+
+        use_numba : bool, optional
+            True  to  compile  the  generated  matrix  functions  with numba
+            (@njit(cache=True)).  Only  available  for  Python.  Default  is
+            False
+
+        batched : bool, optional
+            True  to  generate  matrix  functions  accepting parameters with
+            leading  batch  dimensions  (q  of shape (B, n) instead of (n,))
+            and  returning  all  the  matrices  at  once  (shape (B, 3, n)
+            instead  of  (3,  n)).  Only  available  for  the numpy Python
+            code (with jax, use jax.vmap instead). Default is False
         
         """
 
-        name = name.lower()
+        use_cython = name.lower() == 'cython'
+        use_jax = name.lower() == 'jax'
+        if name.lower() == 'python_numba':
+            name, use_numba = 'python', True
+        elif use_cython or use_jax:
+            name = 'python'
+
+        for attribute, value in Language._CONFIGS[name.lower()].items():
+            setattr(self, attribute, value)
+
+        if use_numba and self.name != 'python':
+            raise ValueError("numba compilation is only available for "
+                             "Python code generation")
+        if use_numba and (use_cython or use_jax):
+            raise ValueError("numba can only compile the numpy Python code")
+        if batched and (self.name != 'python' or use_numba or use_cython or
+                        use_jax):
+            raise ValueError("batched functions are only available for the "
+                             "numpy Python code generation")
+        self.use_numba = use_numba
+        self.use_cython = use_cython
+        self.use_jax = use_jax
+        self.batched = batched
+        self.cache_key = (self.name, use_numba, use_cython, use_jax, batched)
+        if use_numba or use_cython or batched:
+            # The module must be importable to be compiled or to be called
+            # on arrays : norm is in numpy.linalg
+            self.header = self.header.replace(
+                ", norm\n", "\n").replace("inv, pinv", "inv, pinv, norm")
+        if use_numba:
+            # abs is a builtin
+            self.header = self.header.replace(
+                "from math import cos, sin, acos, abs",
+                "from math import cos, sin, acos, sqrt")
+            self.header += ("\nfrom numpy import empty"
+                            "\nfrom numba import njit, prange")
+        if use_cython:
+            # C math functions instead of the Python ones
+            self.header = self.header.replace(
+                "from math import cos, sin, acos, abs",
+                "cimport cython\nfrom libc.math cimport cos, sin, acos, sqrt")
+            self.header += "\nfrom numpy import empty, asarray"
+            self.extension = 'pyx'
+        if use_jax:
+            # Every function is traceable by jax (no numpy, no math)
+            self.header = ("from jax.numpy import cos, sin, arccos as acos, "
+                           "sqrt, abs\nfrom jax.numpy import vstack, array, "
+                           "cross, dot, zeros, eye, transpose"
+                           "\nfrom jax.numpy.linalg import inv, pinv, norm"
+                           "\nimport time")
+        if batched:
+            # numpy universal functions work on whole arrays
+            self.header = self.header.replace(
+                "from math import cos, sin, acos, abs",
+                "from numpy import cos, sin, arccos as acos, sqrt, abs, "
+                "empty, broadcast")
+
+        self._build_conversion_tables()
+
+        # Types of the parameters / variables from their 'type' key
+        self._type_map = {'double': self.double_type,
+                          'vect': self.vector_type,
+                          'mat': self.matrix_type}
+
+        # Already converted expressions (see convert)
+        self._convert_cache = {}
+
+        # Matrix declarations templates (see _matrix_template)
+        self._mat_templates = {}
+
+    # Conversion tables ======================================================
+
+    def _build_conversion_tables(self):
+        """
+        Description
+        -----------
 
-        # Python .............................................................
+        Builds the operators substitution tables and the function label
+        patterns used by convert, from self.operators and self.fcts
 
-        if name == 'python':
-            self.name = 'python'
-
-            self.fct_prefix = "def _fname_("
-            self.fct_suffix = "):"
-            self.fct_end = ""
-            self.param_separator = ","
-            self.max_line_length = 79
-            self.comment_line = "#"
-            self.comment_par_beg = '"""'
-            self.comment_par_end = '"""'
-            self.indexing_0 = 0
-            self.end_of_line = ''
-            self.is_typed = False
-            self.double_type = 'float'
-            self.vector_type = 'numpy.ndarray'
-            self.matrix_type = 'numpy.ndarray'
-            self.can_return_list = True
-            self.operators = {'**': ['**', False],
-                              '*':  ['*', False],
-                              '@':  ['dot', True],
-                              '/':  ['/', False],
-                              '+':  ['+', False],
-                              '-':  ['-', False],
-                              "[]": ["[]", True]}
-            self.fcts = {'eye': 'eye(__param1__, __param2__)',
-                         'zeros': 'zeros((__param1__, __param2__))',
-                         'cross': 'cross(__param1__, __param2__)',
-                         'vcat': 'vstack((__param1__, __param2__))',
-                         'pluseq': '__param1__ += __param2__',
-                         'matinv': 'inv(__param1__)'}
-            self.docstr_before = False
-            self.extension = 'py'
-            self.mat_obj_start = 'array(['
-            self.mat_obj_end = '])'
-            self.mat_col_separator = ','
-            self.mat_line_separator = ','
-            self.mat_new_line = ['[', ']']
-
-            self.header = "from math import cos, sin, acos, abs" \
-                          "\nfrom numpy import vstack, " + \
-                          "array, cross, dot, zeros, eye, transpose, norm" \
-                          "\nfrom numpy.linalg import inv, pinv" \
-                          "\nimport time"
-
-            self.subscription = 1
-            self.return_ = "return"
-            self.end_loop = ""
-            self.time_start = "start = time.time()"
-            self.time_dt = "dt = time.time() - start"
-            self.while_ = "while __COND__:"
-            self.if_ = "if __COND__:"
-            self.break_ = "break"
+        Returns
+        -------
 
-        # Julia ..............................................................
+        None.
 
-        elif name == "julia":
-            self.name = 'julia'
-            self.fct_prefix = "function _fname_("
-            self.fct_suffix = ")"
-            self.fct_end = "end"
-            self.param_separator = ","
-            self.max_line_length = 92
-            self.comment_line = "#"
-            self.comment_par_beg = '"""'
-            self.comment_par_end = '"""'
-            self.indexing_0 = 1
-            self.end_of_line = ''
-            self.is_typed = False
-            self.double_type = 'Float64'
-            self.vector_type = 'Vector'
-            self.matrix_type = 'Matrix'
-            self.can_return_list = True
-            self.operators = {'**': ['^', False],
-                              '*': ['*', False],
-                              '@': ['*', False],
-                              '/': ['/', False],
-                              '+': ['+', False],
-                              '-': ['-', False],
-                              '[]': ['[]', True]}
-            self.fcts = {'eye': 'Matrix(I,__param1__, __param2__)',
-                         'zeros': 'zeros(__param1__, __param2__)',
-                         'cross': 'cross(__param1__, __param2__)',
-                         'vcat': 'vcat(__param1__, __param2__)',
-                         'pluseq': '__param1__ += __param2__',
-                         'matinv': 'inv(__param1__)'}
-            self.docstr_before = True
-            self.extension = 'jl'
-            self.mat_obj_start = 'vcat('
-            self.mat_obj_end = ')'
-            self.mat_col_separator = ' '
-            self.mat_line_separator = ','
-            self.mat_new_line = ['[', ']']
-
-            self.header = "using LinearAlgebra\n"
-
-            self.subscription = 0
-            self.return_ = "return"
-            self.end_loop = "end"
-            self.time_start = "start = time();"
-            self.time_dt = "dt = time() - start;"
-            self.while_ = "while __COND__"
-            self.if_ = "if __COND__"
-            self.break_ = "break"
+        """
 
-        # MATLAB .............................................................
+        # Operators substitution tables
+        self._op_keys = [[op, False] for op in self.operators]
+        self._op_keys[-1][1] = True  # Subscription is considered as a function
+        self._op_new = list(self.operators.values())
 
-        elif name == "matlab":
-            self.name = 'matlab'
-            self.fct_prefix = "function return_value = _fname_("
-            self.fct_suffix = ")"
-            self.fct_end = "end"
-            self.param_separator = ","
-            self.max_line_length = 75
-            self.comment_line = "%"
-            self.comment_par_beg = '%{\n'
-            self.comment_par_end = '\n%}'
-            self.indexing_0 = 1
-            self.end_of_line = ';'
-            self.is_typed = False
-            self.double_type = 'double'
-            self.vector_type = 'double'
-            self.matrix_type = 'double'
-            self.can_return_list = True
-            self.operators = {'**': ['.^', False],
-                              '*': ['.*', False],
-                              '@': ['*', False],
-                              '/': ['./', False],
-                              '+': ['+', False],
-                              '-': ['-', False],
-                              '[]': ['()', True]}
-            self.fcts = {'eye': 'eye(__param1__, __param2__)',
-                         'zeros': 'zeros(__param1__, __param2__)',
-                         'cross': 'cross(__param1__, __param2__)',
-                         'vcat': "[__param1__; __param2__]",
-                         'pluseq': '__param1__ = __param1__ + __param2__',
-                         'matinv': 'inv(__param1__)'}
-            self.docstr_before = False
-            self.extension = 'm'
-            self.mat_obj_start = '['
-            self.mat_obj_end = ']'
-            self.mat_col_separator = ','
-            self.mat_line_separator = ';'
-            self.mat_new_line = ['', '']
-
-            self.header = ""
-
-            self.subscription = 0
-            self.return_ = "return_value ="
-            self.end_loop = "end"
-            self.time_start = "start = tic;"
-            self.time_dt = "dt = toc(start);"
-            self.while_ = "while __COND__"
-            self.if_ = "if __COND__"
-            self.break_ = "break"
+        # Patterns of the function labels (___function__arg1__arg2___)
+        self._fct_patterns = {
+            function: re.compile(r'(?:^|(?<=(\W)))___' + function +
+                                 r'__([a-zA-Z0-9\-.@*/+()\[\],:]+_{0,2})+__'
+                                 r'_(?:$|(?:(\W)))?')
+            for function in self.fcts}
+
+    # Matrix from list =======================================================
 
     def matrix(self, mat_list):
         """
@@ -397,18 +555,10 @@ class Language:
         
         """
 
-        matrix = self.mat_obj_start
-        for i, line in enumerate(mat_list):
-            matrix += self.mat_new_line[0]
-            mat_line = ''
-            for j, val in enumerate(line):
-                mat_line += self.convert(val)
-                mat_line += self.mat_col_separator if j < len(line) - 1 \
-                    else self.mat_new_line[1]
-            matrix += mat_line
-            matrix += self.mat_line_separator if i < len(mat_list) - 1 \
-                else self.mat_obj_end
-        return matrix
+        nb_columns = len(mat_list[0]) if mat_list else 0
+        template = self._matrix_template(len(mat_list), nb_columns)
+        return template.format(*[self.convert(val)
+                                 for line in mat_list for val in line])
 
     # Matrix from matrix label ===============================================
 
@@ -423,8 +573,8 @@ class Language:
         Parameter
         ---------
         
-        mat_list : list of list of str
-            Matrix expression in Python
+        label : str
+            Matrix label
         
         Returns
         -------
@@ -440,21 +590,56 @@ class Language:
 
         elements = elems[4:-1]
 
-        matrix = self.mat_obj_start
-        i_e = 0
-
-        for i in range(nbl):
-            matrix += self.mat_new_line[0]
-            mat_line = ''
-            for j in range(nbc):
-                mat_line += self.convert(elements[i_e])
-                mat_line += self.mat_col_separator if j < nbc - 1 \
-                    else self.mat_new_line[1]
-                i_e += 1
-            matrix += mat_line
-            matrix += self.mat_line_separator if i < nbl - 1 \
-                else self.mat_obj_end
-        return matrix
+        return self._matrix_template(nbl, nbc).format(
+            *[self.convert(element) for element in elements])
+
+    # Matrix template ========================================================
+
+    def _matrix_template(self, nb_lines, nb_columns, line_prefix=''):
+        """
+        Description
+        -----------
+
+        Returns  the  matrix  declaration  of  the  given  shape with a "{}"
+        placeholder  for  every  element,  to  be  filled  with str.format.
+        Templates are built once per shape and cached.
+
+        Parameters
+        ----------
+
+        nb_lines : int
+            Number of lines of the matrix
+
+        nb_columns : int
+            Number of columns of the matrix
+
+        line_prefix : str, optional
+            String inserted before every line of the matrix but the first one
+            Default is ''
+
+        Returns
+        -------
+
+        str
+            Matrix template
+
+        """
+
+        key = (nb_lines, nb_columns, line_prefix)
+        template = self._mat_templates.get(key)
+        if template is None:
+            def esc(string):
+                return string.replace('{', '{{').replace('}', '}}')
+
+            line = esc(self.mat_new_line[0]) + \
+                esc(self.mat_col_separator).join(['{}'] * nb_columns) + \
+                esc(self.mat_new_line[1])
+            template = esc(self.mat_obj_start) + \
+                esc(self.mat_line_separator + line_prefix).join(
+                    [line] * nb_lines) + \
+                esc(self.mat_obj_end)
+            self._mat_templates[key] = template
+        return template
 
     # Convert expr to language ===============================================
 
@@ -480,102 +665,82 @@ class Language:
         
         """
 
-        def scistrtodblstr(scistr, double=True):
-            """
-            Converts a scientific notation string to a double notation string
-
-            Parameters
-            ----------
-            scistr : string
-                scientific notation double
-            double : boolean
-                if False, adds a f after the number : 1.0 become 1.0f
-
-            Returns
-            -------
-            Double notation string
-
-            """
-            if 'e' not in scistr:
-                return scistr
-            e = scistr.find('e')
-            if '.' not in scistr:
-                afterPoint = e
-            else:
-                afterPoint = e - scistr.find('.')
-            afterPoint -= int(scistr[e + 1:])
-            fl = float(scistr)
-            forma = f"%.{max(afterPoint - 1, 1)}f"
-            return str(forma % fl) + ('' if double else 'f')
-
-        def convert_all_sci_to_dbl(string):
-            """
-            Converts  all the numbers written in scientific notation to double
-            notation
-
-            Parameters
-            ----------
-            string : str
-                String to remove scientific notations from
+        converted = self._convert_cache.get(expression)
+        if converted is not None:
+            return converted
+        original = expression
 
-            Returns
-            -------
-            String containing double notations instead of scientific notations
-            """
-
-            # Matching scientific numbers
-            pr = re.compile(r'-?[\d.]+(?:e[\+\-]?\d+)')
-            numbers = pr.findall(string)
-
-            for number in set(numbers):
-                string = string.replace(number, scistrtodblstr(number))
-            return string
-
-        # . . . . . . . . . . . . . .
+        # Each step is skipped when the characters it needs are missing
 
         # Converting matrix labels
-        pattern = re.compile(
-            (r'(?:^|(?<=(\W)))#mat#([\w\-.*/+()\[\],:]+#)+endmat&'
-             r'(?:$|(?:(\W)))'))
-        all_occur = re.finditer(pattern, expression)
         rep = []
         matches = []
-        for occur in all_occur:
-            match = expression[occur.span()[0]:occur.span()[1]]
-            rep.append(match)
-            matches.append(self.matrix_from_label(match))
-        for i_o, match in enumerate(rep):
-            expression = expression.replace(match, f"_MATCH_{i_o}_")
-
-        expression = convert_all_sci_to_dbl(expression)
-
-        list_op = [[op, False] for op in self.operators]
-        list_op[-1][1] = True  # Subscription is considered as a function
-        list_new_ops = [self.operators[op] for op in self.operators]
-
-        expression = replace_many(expression, list_op, list_new_ops)
-        for function in self.fcts:
-            pattern = re.compile(r'(?:^|(?<=(\W)))___' + function +
-                                 r'__([a-zA-Z0-9\-.@*/+()\[\],:]+_{0,2})+__'
-                                 r'_(?:$|(?:(\W)))?')
-            all_occur = re.finditer(pattern, expression)
+        if '#' in expression:
+            for occur in _MAT_LABEL_RE.finditer(expression):
+                match = expression[occur.span()[0]:occur.span()[1]]
+                rep.append(match)
+                matches.append(self.matrix_from_label(match))
+            for i_o, match in enumerate(rep):
+                expression = expression.replace(match, f"_MATCH_{i_o}_")
 
-            oldexp = expression
-            for occur in all_occur:
-                if occur.span()[1] >= len(oldexp):
-                    end = occur.span()[1]
-                else:
-                    end = occur.span()[1] - 1
-                match = oldexp[occur.span()[0]+3:end-3]
-                repl = self.fcts[function]
-                for i_arg, arg in enumerate(match.split('__')[1:]):
-                    repl = repl.replace(f'__param{i_arg+1}__', arg)
-                expression = expression.replace(f"___{match}___", repl)
+        if 'e' in expression:
+            expression = convert_all_sci_to_dbl(expression)
+
+        if not _OP_CHARS.isdisjoint(expression):
+            expression = replace_many(expression, self._op_keys, self._op_new)
+
+        if '___' in expression:
+            for function, pattern in self._fct_patterns.items():
+                expression = pattern.sub(self._fct_replacer(function),
+                                         expression)
 
         for i_m, match in enumerate(matches):
             expression = expression.replace(f"_MATCH_{i_m}_", match)
+
+        self._convert_cache[original] = expression
         return expression
 
+    # Function label replacement =============================================
+
+    def _fct_replacer(self, function):
+        """
+        Description
+        -----------
+
+        Returns  the  function  used  by  convert  with re.sub to replace the
+        labels of a function (___function__arg1__arg2___) by their expression
+        in the language
+
+        Parameters
+        ----------
+
+        function : str
+            Function name (key of self.fcts)
+
+        Returns
+        -------
+
+        function
+            Replacement function taking a re.Match of the label
+
+        """
+
+        template = self.fcts[function]
+
+        def replace_label(occur):
+            label = occur.group(0)
+
+            # The pattern may also match the character following the label
+            tail = '' if label.endswith('___') else label[-1]
+            args = label[3:len(label) - len(tail) - 3].split('__')[1:]
+
+            repl = template
+            for i_arg, arg in enumerate(args):
+                repl = repl.replace(f'__param{i_arg + 1}__', arg)
+            return repl + tail
+
+        return replace_label
+
     # Justifying docstring ===================================================
 
     def justify(self, docstring, is_a_paragraph=True):
@@ -606,9 +771,10 @@ class Language:
         """
 
         all_lines = docstring.split('\n')
+        max_line_length = self.max_line_length
 
         for i, line in enumerate(all_lines):
-            if len(line) > self.max_line_length:
+            if len(line) > max_line_length:
                 # Indentation Level
                 ind = 0
                 i_c = 0
@@ -624,7 +790,7 @@ class Language:
                         ind += 1
                     i_c += 1
 
-                max_len = self.max_line_length - ind
+                max_len = max_line_length - ind
                 if not is_a_paragraph:
                     max_len -= len(self.comment_line) + 1
 
@@ -637,28 +803,25 @@ class Language:
                 if len(' '.join(all_words)) <= max_len:
                     break
 
+                # Length of the line made of the first words
+                length = -1
                 for i_w, word in enumerate(all_words):
-                    if len(' '.join(all_words[:i_w + 1])) > max_len:
+                    length += len(word) + 1
+                    if length > max_len:
                         new_line = ' '.join(all_words[:i_w])
                         rest_of_line = ' '.join(all_words[i_w:])
                         break
 
-                justified = len(new_line) == max_len
-                nb_spaces = 1
-                while not justified:
-                    justified = len(new_line) == max_len
-                    i_c = 0
-                    for char in new_line:
-                        if new_line[i_c] == ' ':
-                            new_line = new_line[:i_c] + ' ' + new_line[i_c:]
-                            justified = len(new_line) == max_len
-                            i_c += nb_spaces
-                            if justified:
-                                break
-                        i_c += 1
-                        if i_c >= len(new_line):
-                            break
-                    nb_spaces += 1
+                # Spreading the missing spaces over the gaps between words,
+                # the leftmost gaps getting the extra ones
+                words = new_line.split(' ')
+                gaps = len(words) - 1
+                if gaps > 0:
+                    base, rem = divmod(max_len - len(new_line), gaps)
+                    seps = [' ' * (base + 1 + (i_g < rem))
+                            for i_g in range(gaps)]
+                    new_line = words[0] + ''.join(sep + word for sep, word
+                                                  in zip(seps, words[1:]))
 
                 all_lines[i] = ' ' * ind + new_line
                 all_lines.insert(i + 1, ' ' * ind + rest_of_line)
@@ -672,7 +835,8 @@ class Language:
     # Generate function code =================================================
 
     def generate_fct(self, ftype, fname, params, expr, varss=[], docstr=None,
-                     matrix_dims=(4, 4), input_is_vector=False, dof=None):
+                     matrix_dims=(4, 4), input_is_vector=False, dof=None,
+                     jit=False):
         """
         Description
         -----------
@@ -717,6 +881,23 @@ class Language:
         dof: list of sympy.core.symbol.Symbol or None
             List  of all the degrees of freedom of the robot. Must not be None
             if input_input_is_vector is True
+
+        jit : bool, optional
+            True  if  the  function  can be compiled with numba : it only does
+            scalar  operations  and  builds its returned matrix. Ignored if
+            self.use_numba,  self.use_cython and self.batched are False. When
+            it  is  True,  the  returned  matrix  is filled element by element
+            and the function is :
+                - decorated with @njit(cache=True) with numba. If
+                  input_is_vector is True, a function fname_batch(Q)
+                  calling it on every row of Q in parallel is added,
+                - typed  with  Cython  :  the  scalar  parameters  and
+                  variables  are  C  doubles,  the  matrix  is a typed
+                  memoryview and the bounds checks are disabled,
+                - batched : the parameters can have leading batch dimensions
+                  (q[..., i] instead of q[i]) and the matrix has the same
+                  leading dimensions.
+            Default is False
         
         Returns
         -------
@@ -730,164 +911,225 @@ class Language:
         TODO
         """
 
+        out = []
+        self._generate_fct_into(out, ftype, fname, params, expr, varss, docstr,
+                                matrix_dims, input_is_vector, dof, jit)
+        return ''.join(out)
+
+    # Generate function code into a list =====================================
+
+    def _generate_fct_into(self, out, ftype, fname, params, expr, varss=[],
+                           docstr=None, matrix_dims=(4, 4),
+                           input_is_vector=False, dof=None, jit=False):
+        """
+        Description
+        -----------
+
+        Same as generate_fct, but the code fragments are appended to out
+        instead of being joined and returned, so that callers generating
+        many functions can join the whole file at once.
+
+        Parameters
+        ----------
+
+        out : list of str
+            List the code fragments are appended to
+
+        ftype, fname, params, expr, varss, docstr, matrix_dims,
+        input_is_vector, dof, jit :
+            See generate_fct
+
+        Returns
+        -------
+
+        None.
+
+        """
+
         # Function declaration ...............................................
 
+        jit = jit and (self.use_numba or self.use_cython or self.batched)
+        typed = jit and self.use_cython
+        batched = jit and self.batched
+        if jit and self.use_numba:
+            out.append('@njit(cache=True)\n')
+        elif typed:
+            out.append('@cython.boundscheck(False)\n'
+                       '@cython.wraparound(False)\n')
+
         if self.is_typed:
             types = {"double": self.double_type,
                      "mat": self.matrix_type,
                      "void": "void"}
-            code = types + " "
+            decl = types + " "
         else:
-            code = ""
-        code += self.fct_prefix.replace('_fname_', fname)
+            decl = ""
+        decl += self.fct_prefix.replace('_fname_', fname)
 
         if self.name == "matlab" and ftype == "void":
-            code = code.replace("return_value = ", "")
+            decl = decl.replace("return_value = ", "")
 
         # Parameters .........................................................
 
         # Sorting parameters in alphabetical order
         params.sort(key=lambda x: x['name'])
 
-        docstrparams = [param.copy() for param in params]
-
         if input_is_vector:
             if self.is_typed:
-                code += self.vector_type + ' '
-            code += 'q'
+                decl += self.vector_type + ' '
+            decl += 'q'
 
             descrq = 'Vector of variables where :'
+            name_to_q = {}
             for i_p, param in enumerate(params):
-                qp = self.slice_mat("q", dof.index(Symbol(param['name'])), None, None,
-                                    None)
+                qp = self.slice_mat("q", dof.index(Symbol(param['name'])),
+                                    None, None, None)
+                if batched:
+                    qp = qp.replace('[', '[..., ', 1)
+                name_to_q[param['name']] = qp
                 descrq += f'\n        - {qp} = ' + \
                           param['name']
                 descrq += ' :\n              ' + param['description']
 
+            # Replacing all the parameters by the elements of q at once
+            if name_to_q:
+                params_re = re.compile(r'\b(' + '|'.join(
+                    re.escape(name) for name in name_to_q) + r')\b')
+
+                def to_q(expression):
+                    return params_re.sub(lambda m: name_to_q[m.group(1)],
+                                         expression)
+            else:
+                def to_q(expression):
+                    return expression
+
             paramq = {'name': 'q', 'type': 'vect', 'description': descrq}
             docstrparams = [paramq]
 
         else:
-            for i, param in enumerate(params):
+            docstrparams = [param.copy() for param in params]
+            decl_params = []
+            for param in params:
                 if self.is_typed:
-                    typ = self.double_type if param['type'] == 'double' else \
-                        (self.vector_type if param['type'] == 'vect' else
-                         self.matrix_type if param['type'] == 'mat' else None)
-                    code += typ + ' '
-                code += param['name']
-
-                if i < len(params) - 1:
-                    code += self.param_separator + ' '
+                    typ = self._type_map.get(param['type'], '')
+                    decl_params.append(typ + ' ' + param['name'])
+                elif typed and param['type'] == 'double':
+                    decl_params.append('double ' + param['name'])
+                else:
+                    decl_params.append(param['name'])
+            decl += (self.param_separator + ' ').join(decl_params)
 
-        code += self.fct_suffix + '\n' + indent(1)
+        start = len(out)
+        out.extend([decl, self.fct_suffix, '\n' + indent(1)])
 
         # Docstring ..........................................................
 
-        real_docstr = ''
         if docstr is not None:
+            real_docstr = []
             if self.name != "matlab":
-                real_docstr += self.comment_par_beg
+                real_docstr.append(self.comment_par_beg)
             if self.name == 'julia':
                 docstr = docstr.replace('\\', '\\\\')
 
             if self.name in ['matlab', 'julia']:
-                real_docstr += '\n    ' + \
-                               ' '.join(code.split('\n')[0].split(' ')[1:])
-                real_docstr += '\n'
+                real_docstr.append('\n    ' + ' '.join(decl.split(' ')[1:]) +
+                                   self.fct_suffix + '\n')
             if self.name == "matlab":
-                real_docstr += fname + "\n"
+                real_docstr.append(fname + "\n")
             if self.name in ['python', 'julia', 'matlab']:
-                real_docstr += '\nDescription\n-----------\n\n' + docstr
-                real_docstr += '\n\nParameters\n----------\n\n'
+                real_docstr.append('\nDescription\n-----------\n\n' + docstr +
+                                   '\n\nParameters\n----------\n\n')
                 for param in docstrparams:
-                    real_docstr += param['name']
-                    typ = self.double_type if param['type'] == 'double' else \
-                        (self.vector_type if param['type'] == 'vect' else
-                         self.matrix_type if param['type'] == 'mat' else '')
-                    real_docstr += ' : ' + typ + '\n    '
-                    real_docstr += param['description'] + '\n\n'
+                    typ = self._type_map.get(param['type'], '')
+                    real_docstr.append(param['name'] + ' : ' + typ + '\n    ' +
+                                       param['description'] + '\n\n')
 
             if self.name != "matlab":
-                real_docstr += self.comment_par_end
+                real_docstr.append(self.comment_par_end)
 
+            real_docstr = ''.join(real_docstr)
             par = self.name != "matlab"
 
             if self.docstr_before:
                 real_docstr = self.justify(real_docstr, is_a_paragraph=par)
-                code = real_docstr + '\n' + code + '\n    '
+                out.insert(start, real_docstr + '\n')
+                out.append('\n    ')
             else:
                 real_docstr = self.justify(
                     real_docstr.replace('\n', '\n    '), is_a_paragraph=par)
-                code += real_docstr + '\n\n    '
+                out.append(real_docstr + '\n\n    ')
 
         # Variables ..........................................................
 
+        convert = self.convert
+        end_of_line = self.end_of_line
+
+        # C variables already declared (Cython)
+        declared = set()
+
         loops = 0  # Indent level
-        for i_var, var in enumerate(varss):
+        for var in varss:
 
             # Special values . . . . . . . . . . . . . . . . . . . . . . . . .
 
             if var["name"] == "__FOR__":
                 loops += 1
-                code += (self.for_loop(var['value'][0], var['value'][1]) +
-                         f"\n{indent(loops + 1)}")
+                out.append(self.for_loop(var['value'][0], var['value'][1]))
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var["name"] == "__WHILE__":
                 loops += 1
-                code += (f"{self.while_.replace('__COND__', var['value'])}"
-                         f"\n{indent(loops + 1)}")
+                out.append(self.while_.replace('__COND__', var['value']))
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var["name"] == "__IF__":
                 loops += 1
-                code += (f"{self.if_.replace('__COND__', var['value'])}"
-                         f"\n{indent(loops + 1)}")
+                out.append(self.if_.replace('__COND__', var['value']))
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var["name"] == "__BREAK__":
-                code += f"{self.break_}\n{indent(loops + 1)}"
+                out.append(self.break_)
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var['name'] == "__ENDLOOP__":
                 loops -= 1
-                code = code[:-4] + f"{self.end_loop}\n{indent(loops + 1)}"
+                # Removing the indentation of the previous line
+                out[-1] = out[-1][:-4]
+                out.append(self.end_loop)
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var["name"] == "__TIMESTART__":
-                code += f"{self.time_start}\n{indent(loops + 1)}"
+                out.append(self.time_start)
+                out.append(f"\n{indent(loops + 1)}")
                 continue
             elif var["name"] == "__TIMEDT__":
-                code += f"{self.time_dt}\n{indent(loops + 1)}"
+                out.append(self.time_dt)
+                out.append(f"\n{indent(loops + 1)}")
                 continue
 
             # Normal values  . . . . . . . . . . . . . . . . . . . . . . . . .
 
             if self.is_typed:
-                typ = self.double_type if var['type'] == 'double' else \
-                      (self.vector_type if var['type'] == 'vect' else
-                       self.matrix_type if var['type'] == 'mat' else '')
+                typ = self._type_map.get(var['type'], '')
                 if typ != '':
-                    code += typ + ' '
+                    out.append(typ + ' ')
 
-            if input_is_vector:
-                for i_p, param in enumerate(params):
-                    qp = self.slice_mat("q", dof.index(Symbol(param['name'])),
-                                        None,
-                                        None,
-                                        None)
-                    varss[i_var]['value'] = replace_var(varss[i_var]['value'],
-                                                        param['name'],
-                                                        f'{qp}')
+            value = to_q(var['value']) if input_is_vector else var['value']
+            if typed and var['type'] == 'double' and \
+                    var['name'] not in declared:
+                declared.add(var['name'])
+                out.append('cdef double ')
             if var["type"] != "function":
-                code += var['name'] + ' = '
-            code += self.convert(varss[i_var]['value'])
-            code += self.end_of_line + '\n' + indent(1 + loops)
+                out.append(var['name'] + ' = ')
+            out.append(convert(value) + end_of_line)
+            out.append('\n' + indent(1 + loops))
 
         if len(varss) > 0:
-            code += '\n' + indent(1)
+            out.append('\n' + indent(1))
 
         # Matrix Return ......................................................
 
         if matrix_dims != (1, 1):
-            if fname == 'T_CHEST_R_SFE_joint_inv':
-                print('azer')
-                pass
             # Matrix name
             mat_name = 'mat'
             while mat_name in [var['name'] for var in varss] or mat_name \
@@ -895,59 +1137,168 @@ class Language:
                 mat_name += "0"
 
             # Matrix declaration
-            code += self.comment_line + ' Returned Matrix\n' + indent(1)
-
-            code += mat_name + ' = ' + self.mat_obj_start
-
-            # For 0 to the number of rows
-            for i in range(matrix_dims[0]):
-                # Empty matrix line
-                if i > 0:
-                    code += '\n' + indent(1) + (3 + len(mat_name)) * ' '
-                code += self.mat_new_line[0]
-                line = ''
-
-                # For 0 to the number of columns
-                for j in range(matrix_dims[1]):
-                    element = expr[i][j]
-                    if input_is_vector:
-                        for i_p, param in enumerate(params):
-                            qp = self\
-                                .slice_mat("q",
-                                            dof.index(Symbol(param['name'])),
-                                            None, None, None)
-                            element = replace_var(element, param['name'],
-                                                  f'{qp}')
-                    line += self.convert(element)
-                    line += self.mat_col_separator if j < matrix_dims[1] - 1 \
-                        else self.mat_new_line[1]
-
-                # Adding the created line to the matrix
-                code += line
-
-                code += self.mat_line_separator if i < matrix_dims[0] - 1 \
-                    else self.mat_obj_end
-
-            code += self.end_of_line + f'\n\n    {self.return_} '\
-                    + mat_name + \
-                    self.end_of_line + '\n' + self.fct_end
+            out.append(self.comment_line + ' Returned Matrix\n' + indent(1))
+
+            # Leading dimensions of the matrix (batched)
+            if not batched:
+                batch_shape = None
+            elif input_is_vector:
+                batch_shape = 'q.shape[:-1]'
+            elif params:
+                batch_shape = 'broadcast(' + ', '.join(
+                    param['name'] for param in params) + ').shape'
+            else:
+                batch_shape = '()'
+
+            self._emit_matrix(out, mat_name, expr, matrix_dims,
+                              to_q if input_is_vector else None,
+                              by_element=jit, typed=typed,
+                              batch_shape=batch_shape)
+
+            # A typed memoryview is returned as a numpy array
+            returned = f'asarray({mat_name})' if typed else mat_name
+            out.append(end_of_line + f'\n\n    {self.return_} ' + returned +
+                       end_of_line + '\n' + self.fct_end)
+
+            if jit and self.use_numba and input_is_vector:
+                out.append('\n\n')
+                self._emit_batch_fct(out, fname, matrix_dims)
 
         # Scalar return ......................................................
 
         else:
             if input_is_vector:
-                for i_p, param in enumerate(params):
-                    qp = self.slice_mat("q", dof.index(Symbol(param['name'])),
-                                        None, None, None)
-                    expr = replace_var(expr, param['name'],
-                                       f'{qp}')
+                expr = to_q(expr)
             if ftype != "void":
-                code += self.return_ + ' ' + self.convert(expr) + \
-                        self.end_of_line
+                out.append(self.return_ + ' ' + convert(expr) + end_of_line)
 
-            code += '\n' + self.fct_end
+            out.append('\n' + self.fct_end)
 
-        return code
+    # Matrix return value ====================================================
+
+    def _emit_matrix(self, out, mat_name, expr, matrix_dims, to_q=None,
+                     by_element=False, typed=False, batch_shape=None):
+        """
+        Description
+        -----------
+
+        Appends the declaration of the returned matrix of generate_fct to out
+
+        Parameters
+        ----------
+
+        out : list of str
+            Code fragments of the function being generated
+
+        mat_name : str
+            Name of the matrix variable
+
+        expr : list of list of str
+            Expression of every element of the matrix
+
+        matrix_dims : tuple of 2 ints
+            Dimensions of the matrix
+
+        to_q : function or None, optional
+            Function  replacing  the  parameters of an expression by the
+            elements of q. None if the input is not a vector.
+            Default is None
+
+        by_element : bool, optional
+            True  to  allocate  the  matrix and assign its elements one by one
+            instead  of  declaring  it  at once (numba compiles nested list
+            literals poorly). Python only. Default is False
+
+        typed : bool, optional
+            True  to  declare  the  matrix  as  a  Cython  typed memoryview
+            (double[:, ::1]). Only used if by_element is True. Default is
+            False
+
+        batch_shape : str or None, optional
+            Expression  of  the  leading  (batch)  dimensions of the matrix.
+            Every  element  is  then  assigned  along these dimensions. Only
+            used if by_element is True. Default is None (no batch)
+
+        Returns
+        -------
+
+        None.
+
+        """
+
+        nb_lines, nb_columns = matrix_dims
+        convert = self.convert
+        elements = [expr[i][j] for i in range(nb_lines)
+                    for j in range(nb_columns)]
+        if to_q is not None:
+            elements = [to_q(element) for element in elements]
+
+        if by_element:
+            if typed:
+                out.append('cdef double[:, ::1] ')
+            if batch_shape is None:
+                out.append(f'{mat_name} = empty(({nb_lines}, {nb_columns}))')
+                index = ''
+            else:
+                out.append(f'{mat_name} = empty({batch_shape} + '
+                           f'({nb_lines}, {nb_columns}))')
+                index = '..., '
+            for k, element in enumerate(elements):
+                i, j = divmod(k, nb_columns)
+                out.append(f'\n{indent(1)}{mat_name}[{index}{i}, {j}] = '
+                           f'{convert(element)}')
+            return
+
+        # Every line is aligned on the first one
+        template = self._matrix_template(
+            nb_lines, nb_columns, '\n' + indent(1) + (3 + len(mat_name)) * ' ')
+
+        out.append(mat_name + ' = ')
+        out.append(template.format(*[convert(element)
+                                     for element in elements]))
+
+    # Batch function (numba) =================================================
+
+    def _emit_batch_fct(self, out, fname, matrix_dims):
+        """
+        Description
+        -----------
+
+        Appends  to  out a function fname_batch(Q) calling fname on every row
+        of Q in parallel (numba prange). The results are returned in a (N x
+        nb_lines x nb_columns) array.
+
+        Parameters
+        ----------
+
+        out : list of str
+            Code fragments the function is appended to
+
+        fname : str
+            Name of the function called on every row (its parameter is q)
+
+        matrix_dims : tuple of 2 ints
+            Dimensions of the matrix returned by fname
+
+        Returns
+        -------
+
+        None.
+
+        """
+
+        nb_lines, nb_columns = matrix_dims
+        docstr = (f'"""\nDescription\n-----------\n\nCalls {fname} on every '
+                  'row of Q in parallel.\n\nParameters\n----------\n\nQ : '
+                  f'{self.matrix_type}\n    (N x n) matrix where every row is '
+                  f'a vector q of {fname}\n\n"""')
+        out.append('@njit(parallel=True, cache=True)\n'
+                   f'def {fname}_batch(Q):\n    ' +
+                   self.justify(docstr.replace('\n', '\n    ')) + '\n\n'
+                   f'    out = empty((Q.shape[0], {nb_lines}, {nb_columns}))\n'
+                   '    for i in prange(Q.shape[0]):\n'
+                   f'        out[i] = {fname}(Q[i])\n'
+                   '    return out\n')
 
     # Generating titles ______________________________________________________
 
@@ -974,35 +1325,31 @@ class Language:
             Title string
 
         """
+        comment_line = self.comment_line
+        max_line_length = self.max_line_length
+
         if self.name == "matlab" and level == 0:
             code = "%% "
         else:
-            code = self.comment_line + ' '
+            code = comment_line + ' '
         if level == 0:
-            for _ in range(self.max_line_length - 2 - (self.name == "matlab")):
-                code += '-'
-            code += '\n' + self.comment_line + ' |'
-
-            is_symetrical = (self.max_line_length - 3 - \
-                             len(self.comment_line) - len(text)) % 2 == 0
-            spaces = (self.max_line_length - 3 - \
-                      len(self.comment_line) - len(text)) // 2
+            code += '-' * (max_line_length - 2 - (self.name == "matlab"))
+            code += '\n' + comment_line + ' |'
+
+            is_symetrical = (max_line_length - 3 -
+                             len(comment_line) - len(text)) % 2 == 0
+            spaces = (max_line_length - 3 -
+                      len(comment_line) - len(text)) // 2
             left_spaces = spaces
             right_spaces = spaces if is_symetrical else spaces + 1
 
-            for _ in range(left_spaces):
-                code += ' '
-            code += text.upper()
-            for _ in range(right_spaces):
-                code += ' '
-            code += f'|\n{self.comment_line} '
-            for _ in range(self.max_line_length - 2):
-                code += '-'
+            code += ' ' * left_spaces + text.upper() + ' ' * right_spaces
+            code += f'|\n{comment_line} '
+            code += '-' * (max_line_length - 2)
 
         elif level == 1:
             code += text + ' '
-            for _ in range(self.max_line_length - len(text) - 3):
-                code += '_'
+            code += '_' * (max_line_length - len(text) - 3)
 
         return code
 
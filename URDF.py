@@ -1,78 +1,156 @@
-from xml.dom import minidom
+# xml parser : lxml when it is installed, the standard library otherwise.
+# both have the same iterparse() / element api, only the parsing options
+# differ (lxml can drop comments and processing instructions itself,
+# ElementTree never reports them)
+try:
+    from lxml import etree
+    _BACKEND = 'lxml'
+    _ITERPARSE_OPTIONS = {'remove_comments': True, 'remove_pis': True}
+except ImportError:
+    from xml.etree import ElementTree as etree
+    _BACKEND = 'etree'
+    _ITERPARSE_OPTIONS = {}
+import ast
+import math
+import operator
+import os
 import re
 import numpy as np
 
-class URDF:
+# xacro substitution (${...})
+_XACRO_RE = re.compile(r'\$\{[^}]*\}')
 
-    joints = []
-    links = []
-    transmissions = []
-    props = []
-    attr = []
-    jseq = []
+# operators allowed in a ${...} expression
+_XACRO_OPS = {ast.Add: operator.add, ast.Sub: operator.sub,
+              ast.Mult: operator.mul, ast.Div: operator.truediv,
+              ast.USub: operator.neg, ast.UAdd: operator.pos}
 
-    def __init__(self, file_name):
-        
-        dom = minidom.parse(file_name)
 
-        self.links = dom.getElementsByTagName('link')
-        self.joints = dom.getElementsByTagName('joint')
-        self.properties = dom.getElementsByTagName('property')
-        self.robot = dom.getElementsByTagName('robot')
-        self.attr = self.getattr(self.robot.item(0),{},[])
+def _xacro_eval(expr, values):
+    # value of a ${...} expression : numbers, property names, + - * / and
+    # parentheses only (the file is never executed). raises ValueError for
+    # anything else
+    def ev(node):
+        if isinstance(node, ast.Expression):
+            return ev(node.body)
+        if isinstance(node, ast.Constant) and \
+                isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in values:
+            return values[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in _XACRO_OPS:
+            return _XACRO_OPS[type(node.op)](ev(node.left), ev(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _XACRO_OPS:
+            return _XACRO_OPS[type(node.op)](ev(node.operand))
+        raise ValueError(expr)
 
-        # get the properties
-        #print(f'{len(self.properties)} properties')
-        Props = []
-        for k in range(len(self.properties)):
-            property = self.properties.item(k)
-            if len(property.attributes) > 0:
-                attributes = property.getAttributes
-                
-                att = {}
-                for i in range(len(attributes)):
-                    
-                    attribute = attributes.item(i-1)
-                    n = attribute.name
-                    v = attribute.value
-                    att[n] = v
+    try:
+        return ev(ast.parse(expr.strip(), mode='eval'))
+    except (SyntaxError, TypeError, ZeroDivisionError) as e:
+        raise ValueError(expr) from e
+
+
+def _xacro_substitute(v, props):
+    # v with every ${...} replaced by its value, computed from the
+    # properties defined so far (a property can use the ones before it).
+    # the expressions that can not be computed are kept verbatim
+    def replace(match, values):
+        try:
+            value = _xacro_eval(match.group(0)[2:-1], values)
+        except ValueError:
+            return match.group(0)
+        return str(float(value)) if isinstance(value, (int, float)) \
+            else value
+
+    values = {'pi': math.pi}
+    for prop in props:
+        if 'name' not in prop or 'value' not in prop:
+            continue
+        value = _XACRO_RE.sub(lambda m: replace(m, values), prop['value'])
+        try:
+            values[prop['name']] = float(value)
+        except ValueError:
+            values[prop['name']] = value
 
-                Props = [[Props],[att]]
+    return _XACRO_RE.sub(lambda m: replace(m, values), v)
+
+class URDF:
+
+    # every attribute is set per instance in __init__ (no shared mutable
+    # class-level lists)
+    __slots__ = ('joints', 'links', 'transmissions', 'props', 'attr', 'jseq',
+                 'robot', '_link_index', '_parent_to_joint')
+
+    # instances built by from_file, keyed by (absolute path, mtime)
+    _cache = {}
+
+    def __init__(self, file_name):
         
-        self.props = Props
+        # parse the file in a single streaming pass
+        elements, self.props, self.attr = self.parse_elements(file_name)
 
         # get the joints
-        self.joints = self.get_elements(dom, 'joint', Props)
+        self.joints = elements['joint']
 
         # get the links
-        self.links = self.get_elements(dom, 'link', Props)
+        self.links = elements['link']
         
         # get the transmissions
-        self.transmissions = self.get_elements(dom, 'transmission', Props)
+        self.transmissions = elements['transmission']
         
         # get the robot
-        self.robot = self.get_elements(dom, 'robot', Props)
+        self.robot = elements['robot']
 
-        p = np.zeros((1, len(self.links)))[0]
-        for j in range(len(self.joints)):
-            i = self.ln2i(self.joints[j]['parent']['link'])
-            p[i] = p[i] + 1
-            i = self.ln2i(self.joints[j]['child']['link'])
-            p[i] = p[i] - 1
+        # index of the first link with a given name, and of the first joint
+        # with a given parent link (see ln2i and findnextjoint)
+        self._link_index = {}
+        for i, link in enumerate(self.links):
+            self._link_index.setdefault(link['name'], i)
+        self._parent_to_joint = {}
+        for j, joint in enumerate(self.joints):
+            self._parent_to_joint.setdefault(joint['parent']['link'], j)
+
+        # for each link, number of joints it is the parent of minus number of
+        # joints it is the child of : the base link has the highest value
+        n = len(self.links)
+        parents = np.fromiter(
+            (self._link_index[j['parent']['link']] for j in self.joints
+             if j['parent']['link'] in self._link_index), dtype=np.intp)
+        children = np.fromiter(
+            (self._link_index[j['child']['link']] for j in self.joints
+             if j['child']['link'] in self._link_index), dtype=np.intp)
+        p = np.bincount(parents, minlength=n) - \
+            np.bincount(children, minlength=n)
 
-        base_link = np.argmax(p)
+        base_link = int(p.argmax())
         base_link_name = self.links[base_link]['name']
+
+        # follow the chain from the base link, one parent -> joint lookup per
+        # joint
+        parent_to_joint = self._parent_to_joint
         link = base_link_name
         self.jseq = [None]*len(self.joints)
         for j in range(len(self.joints)):
-            jj = self.findnextjoint(link) # --------------
-            if jj == []:
+            jj = parent_to_joint.get(link)
+            if jj is None:
                 break
             self.jseq[j] = jj
             link = self.joints[jj]['child']['link']
         
         #self.display()
         
+    @classmethod
+    def from_file(cls, file_name):
+        # same as URDF(file_name), but a file that was already loaded and has
+        # not been modified since is not parsed again. the returned object is
+        # shared between the callers, it must not be modified
+        key = (os.path.abspath(file_name), os.path.getmtime(file_name))
+        urdf = cls._cache.get(key)
+        if urdf is None:
+            urdf = cls(file_name)
+            cls._cache[key] = urdf
+        return urdf
+
     # def robot(self):
     #     for i in range(self.njoints()):
     #         # create link objects
@@ -87,93 +165,123 @@ class URDF:
         return len(self.joints)
 
     def findnextjoint(self,link):
-        joint = []
-        for j in range(len(self.joints)):
-            if link == self.joints[j]['parent']['link']:
-                joint = j
-                return joint
-        return joint
+        return self._parent_to_joint.get(link, [])
 
     def ln2i(self,name):
-        idx = []
-        for i in range(len(self.links)):
-            if self.links[i]['name'] == name:
-                idx = i
-                return idx
-        return idx
+        return self._link_index.get(name, [])
 
     def display(self):
-        for j in range(self.njoints()):
-            joint = self.joints[j]
-            print(f"j{j+1}: {joint['parent']['link']} -> {joint['child']['link']} ({joint['type']})")
+        print(self, end='')
 
-    def get_elements(self, doc, elname, props):
-        elements = doc.getElementsByTagName(elname)
-        # get the links
-        List = []
-        #print(f'{len(elements)} {elname}')
-        # step through the list of  elements found
-        for k in range(len(elements)):
-            element = elements.item(k)
+    def parse_elements(self, file_name):
+        # single streaming pass over the file : returns the joints, links,
+        # transmissions and robots (dict of lists keyed by tag), the
+        # properties and the attributes of the root element.
+        # the direct children of the root are cleared once read, so the whole
+        # document is never kept in memory. properties apply to the elements
+        # that come after them in the file.
+        elements = {'joint': [], 'link': [], 'transmission': [], 'robot': []}
+        Props = []
+
+        # open elements, from the root to the current one
+        stack = []
+        # what descend() gives for the root, built child by child
+        root_info = {}
+
+        for event, element in etree.iterparse(file_name,
+                                              events=('start', 'end'),
+                                              **_ITERPARSE_OPTIONS):
+            if event == 'start':
+                stack.append(element)
+                continue
+            stack.pop()
+            tag = element.tag
+            top_level = len(stack) == 1
+
+            if tag == 'property' and len(element.attrib) > 0:
+                Props.append(dict(element.attrib))
 
-            info = self.descend(element, props)
-            info = self.getattr(element, info, props)
-            List.append(info)
+            if not stack:
+                # root element, its children are already cleared
+                info = root_info if len(element) > 0 or \
+                    element.text is not None else {}
+                attr = self.getattr(element, {}, [])
+            elif tag in elements or top_level:
+                info = self.descend(element, Props)
+            else:
+                # read later with its ancestor
+                continue
 
-        return List
+            if tag in elements:
+                elements[tag].append(self.getattr(element, dict(info),
+                                                  Props))
+
+            if top_level:
+                # direct child of the root : its descend() result is all the
+                # root needs, the element can be freed
+                if len(info) > 0:
+                    root_info[tag] = info
+                element.clear()
+
+        return elements, Props, attr
 
     def descend(self, node, props):
-        if node.hasChildNodes():
-            t = {}
-
-            nodeChildren = node.childNodes
-            for i in range(len(nodeChildren)):
-                child = nodeChildren.item(i)
-                if child.nodeType == 3:
-                    continue
-                result = self.descend(child, props)
-                if len(result) > 0:
-                    n = child.tagName
-                    t[n] = result
-        elif len(node.attributes) > 0:
-            t = self.getattr(node, {}, props)
-        else:
-            t = {}
-        
-        return t
-    def getattr(self, node, att, props):
-        attributes = node.attributes
+        # all the elements below node, every element coming before its
+        # children (comments and processing instructions are skipped)
+        order = [node]
+        for element in order:
+            order.extend(child for child in element
+                         if isinstance(child.tag, str))
 
-        for i in range(len(attributes)):
-            attribute = attributes.item(i-1)
-            n = attribute.name
-            v = attribute.value
+        # build the dicts from the leaves up, so that the result of every
+        # child is ready when its parent is processed
+        results = {}
+        for element in reversed(order):
+            # text counts as a child node, like in the DOM
+            if len(element) > 0 or element.text is not None:
+                t = {}
 
-            # skip properties with colon in them
-            n.replace(':','_')
+                for child in element:
+                    if not isinstance(child.tag, str):
+                        continue
+                    result = results.pop(child)
+                    if len(result) > 0:
+                        n = child.tag
+                        t[n] = result
+            elif len(element.attrib) > 0:
+                t = self.getattr(element, {}, props)
+            else:
+                t = {}
+            results[element] = t
+
+        return results[node]
+    def getattr(self, node, att, props):
+        for n, v in node.attrib.items():
 
             # do simple xacro type substitution
             # xyz="0 0 ${-base_height}"
-            if len(props) > 0:
-                # is ther a ${...} substrings
-                (s,e) = re.compile(r'\${[^}]*').match(v).span()
+            # (plain substring test first, most values have no ${...})
+            if props and '${' in v:
+                v = _xacro_substitute(v, props)
 
-                print(s,e)
-            
-            try:
-                att[n] = [float(val) for val in v.split(' ')]
-            except:
+            # most values (names, types...) are not numbers : only try to
+            # convert the ones that look like a list of numbers
+            parts = v.split()
+            if parts and all(part[0] in '-+.0123456789' for part in parts):
+                try:
+                    att[n] = [float(val) for val in parts]
+                except ValueError:
+                    att[n] = v
+            else:
                 att[n] = v
             
 
         return att
     
     def __str__(self):
-        s = ""
-        for j in range(self.njoints()):
-            joint = self.joints[j]
-            s += f"j{j+1}: {joint['parent']['link']} -> {joint['child']['link']} ({joint['type']})\n"
-        return s
+        return "".join(f"j{j+1}: {joint['parent']['link']} -> "
+                       f"{joint['child']['link']} ({joint['type']})\n"
+                       for j, joint in enumerate(self.joints))
 
 
 if __name__ == "__main__":
@@ -9,10 +9,11 @@ from URDF import URDF
 from robots import Robot
 from sympy import pretty, Symbol
 from Language import Language
+import os
+import re
 from datetime import datetime
-from code_optimization import replace_var, optimize
-from polynomial_trajectory import get_solution, verify_solution, get_equations
-from anytree import PreOrderIter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from code_optimization import optimize_sym
 from docstrings import *
 
 
@@ -40,13 +41,125 @@ def increment_progressbar(progressbar, increment):
         progressbar.setProperty("value", progressbar.value() + increment)
 
 
+def progressbar_incrementer(progressbar, increment):
+    """
+    Returns  a  function  without arguments that increments the progressbar.
+    When  progressbar is None, the returned function does nothing : the check
+    is done once, not at every increment.
+
+    Parameters
+    ----------
+
+    progressbar : PyQt5.QtWidgets.QProgressBar or None, optional
+        default is None
+        Progressbar to update during the robot creation (used in GUI)
+        If it is None, no progressbar is updated
+
+    increment : float
+        Progressbar value between 0 and 100
+
+    Returns
+    -------
+
+    callable :
+        Function incrementing the progressbar
+    """
+
+    if progressbar is None:
+        return lambda: None
+    return lambda: progressbar.setProperty("value",
+                                           progressbar.value() + increment)
+
+
+# Replace the parameters in variables _______________________________________
+
+def _replace_parameters(varss, new_values, skip_special=False):
+    """
+    Description
+    -----------
+
+    Replaces  the parameters by their new value in the values of variables.
+    All  the  parameters  are  replaced at once : each value is scanned one
+    time only, whatever the number of parameters.
+
+    Parameters
+    ----------
+
+    varss : list of dict
+        Variables  (with  a  'value'  key)  to  modify. The values must not
+        have spaces
+
+    new_values : dict of str
+        New value of every parameter, keyed by parameter name
+
+    skip_special : bool, optional
+        True  to  leave  the  special values (the ones starting with '#') as
+        they are. Default is False
+
+    Returns
+    -------
+
+    None.
+
+    """
+
+    if not new_values:
+        return
+
+    params_re = re.compile(r'\b(' + '|'.join(map(re.escape, new_values)) +
+                           r')\b')
+
+    def new_value(match):
+        return new_values[match.group(1)]
+
+    for var in varss:
+        if skip_special and var['value'].startswith('#'):
+            continue
+        var['value'] = params_re.sub(new_value, var['value'])
+
+
+# Homogeneous coordinates vector _____________________________________________
+
+def _homogeneous_vector(xyz, weight=1.0):
+    """
+    Description
+    -----------
+
+    Value  of  the  (4 x 1) homogeneous coordinates vector of a point, in
+    the  '#mat#...#endmat&'  format  of  the  variables values (see
+    Language.Language.generate_fct).  The  vector  can  be  multiplied by a
+    constant weight.
+
+    Parameters
+    ----------
+
+    xyz : numpy.ndarray
+        (3 x 1) coordinates of the point
+
+    weight : float, optional
+        Factor of all the coordinates (the 4th one is weight). Default is 1.0
+
+    Returns
+    -------
+
+    str :
+        Value of the vector
+
+    """
+
+    coordinates = [str(weight * xyz[0, 0]), str(weight * xyz[1, 0]),
+                   str(weight * xyz[2, 0]), str(weight)]
+    return '#mat#4#1#' + '#'.join(coordinates) + '#endmat&'
+
+
 # Generate Python code from Sympy Matrix _____________________________________
 
 def generate_code_from_sym_mat(sympy_matrix, fname,
                                language=Language('python'),
                                docstr=None,
                                input_is_vector=False,
-                               dof=None):
+                               dof=None,
+                               params=None):
     """
     Description
     -----------
@@ -85,6 +198,11 @@ def generate_code_from_sym_mat(sympy_matrix, fname,
     dof : list of sympy.core.symbol.Symbol or None
         List  of  all the degrees of freedom of the robot. Must not be None if
         inut_input_is_vector is not True
+
+    params : list of dict or None, optional
+        Parameters  of  the  function,  as  returned  by get_parameters. If it
+        is None, they are computed from the free symbols of sympy_matrix.
+        Default is None
         
     Returns
     -------
@@ -94,40 +212,199 @@ def generate_code_from_sym_mat(sympy_matrix, fname,
 
     """
 
-    # 1 - Getting the Sympy Matrix as string .................................
+    # 1 - Common subexpressions elimination .................................
 
-    # Optimizing code
-    varss, expr = optimize(str(sympy_matrix), incl_lists=False)
+    # Done on the matrix elements, the matrix is never printed as a whole
+    nb_lines, nb_columns = sympy_matrix.shape
+    varss, cells = optimize_sym(list(sympy_matrix))
 
     # Matrix containing code samples
-    code_mat = []
-    expr = expr[9:-3].replace(' ', '')
-    elems = expr.split('],[')
-
-    for elem in elems:
-        code_mat.append(elem.split(','))
+    code_mat = [cells[i * nb_columns:(i + 1) * nb_columns]
+                for i in range(nb_lines)]
 
     # 2 - Getting function parameters ........................................
 
-    syms = list(sympy_matrix.free_symbols)
-    syms.sort(key=lambda x: str(x))
-    params = get_parameters(syms)
+    if params is None:
+        params = get_parameters(sorted(sympy_matrix.free_symbols, key=str))
 
+    # Only scalar operations and a matrix : can be compiled with numba
     r = language.generate_fct("mat", fname, params, code_mat, varss=varss,
                               docstr=docstr,
                               input_is_vector=input_is_vector,
                               matrix_dims=(len(code_mat), len(code_mat[0])),
-                              dof=dof)
+                              dof=dof, jit=True)
 
     return r
 
 
+# Generate a transition matrix function ______________________________________
+
+def _generate_transition_matrix(T, fname, docstr, language,
+                                docstr_end='', pretty_matrix=True,
+                                params=None, pretty_T=None):
+    """
+    Description
+    -----------
+
+    Generates  the  function  of  one transition matrix. The pretty printed
+    matrix can be added at the end of the docstring.
+
+    This  runs  in  the worker processes of generate_all_matrices, it must
+    stay a module level function.
+
+    Parameters
+    ----------
+
+    T : sympy.matrices.immutable.ImmutableDenseMatrix
+        Transition matrix
+
+    fname : str
+        Function name
+
+    docstr : str
+        Beginning  of the docstring of the function, without the final
+        period
+
+    language : Language.Language
+        Language you want the code to be generated to
+
+    docstr_end : str, optional
+        Added to the docstring after the matrix. Default is ''
+
+    pretty_matrix : bool, optional
+        True  to  add  the  pretty printed matrix to the docstring, False to
+        skip it (sympy pretty printing is slow). Default is True
+
+    params : list of dict or None, optional
+        Parameters  of  the function (see generate_code_from_sym_mat). Default
+        is None
+
+    pretty_T : str or None, optional
+        Pretty  printed  T,  if  it  is  already  known.  It  is computed when
+        needed if it is None. Default is None
+
+    Returns
+    -------
+
+    str :
+        String containing the code of the function
+
+    str or None :
+        Pretty  printed T (None if pretty_matrix is False), to be reused by
+        the next generations
+
+    """
+
+    if pretty_matrix:
+        if pretty_T is None:
+            pretty_T = pretty(T, num_columns=language.max_line_length - 4,
+                              use_unicode=False)
+        docstr += '. The matrix is :\n\n' + pretty_T + docstr_end
+    else:
+        docstr += '.'
+
+    return generate_code_from_sym_mat(T, fname, language, docstr,
+                                      params=params), pretty_T
+
+
+# Run functions in worker processes __________________________________________
+
+def _use_processes(nb_calls):
+    """
+    Description
+    -----------
+
+    Tells  if  nb_calls  independent  calls  are worth running in worker
+    processes.  With  a  single  call  or  a single CPU, starting the
+    processes  and  copying  the  robot  for  every call cost more than
+    they save.
+
+    Parameters
+    ----------
+
+    nb_calls : int
+        Number of calls to do
+
+    Returns
+    -------
+
+    bool :
+        True if the calls should be done in worker processes
+
+    """
+
+    return nb_calls > 1 and (os.cpu_count() or 1) > 1
+
+
+def _map_processes(function, list_args, message,
+                   progressbar=None, progress_increment=0):
+    """
+    Description
+    -----------
+
+    Calls  function  on  every  element  of list_args in worker processes.
+    The calls must be independent from each other. With a single call or a
+    single  CPU,  the calls are done one after the other in this process
+    (see _use_processes).
+
+    Parameters
+    ----------
+
+    function : callable
+        Module level function to call (it is pickled)
+
+    list_args : list of tuple
+        Positional arguments of every call
+
+    message : str
+        Printed  when  a  call  is  over,  followed by the number of calls
+        done / the total number of calls
+
+    progressbar : PyQt5.QtWidgets.QProgressBar or None, optional
+        default is None
+        Progressbar  to  update  every  time a call is over (used in GUI).
+        If it is None, no progressbar is updated
+
+    progress_increment : float
+        Progressbar  increment.  Default  is  0.  If progressbar is None, this
+        parameter is ignored.
+
+    Returns
+    -------
+
+    list :
+        Results of the calls, in the same order as list_args
+
+    """
+
+    if not list_args:
+        return []
+
+    advance = progressbar_incrementer(progressbar, progress_increment)
+    if not _use_processes(len(list_args)):
+        results = []
+        for i, args in enumerate(list_args):
+            results.append(function(*args))
+            print(f"{message} {i + 1}/{len(list_args)}")
+            advance()
+        return results
+
+    with ProcessPoolExecutor() as executor:
+        futures = [executor.submit(function, *args) for args in list_args]
+        for i, _ in enumerate(as_completed(futures)):
+            print(f"{message} {i + 1}/{len(futures)}")
+            advance()
+        return [future.result() for future in futures]
+
+
 # Generate all matrices ______________________________________________________
 
 def generate_all_matrices(robot, list_ftm, list_btm,
                           language=Language('python'),
                           progressbar=None,
-                          progress_increment=0):
+                          progress_increment=0,
+                          pretty_docstrings=True,
+                          out=None):
     """
     Description
     -----------
@@ -174,91 +451,113 @@ def generate_all_matrices(robot, list_ftm, list_btm,
     progress_increment : float
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
+
+    pretty_docstrings : bool, optional
+        True  to  include  the  pretty printed matrices in the docstrings of
+        the  functions.  Setting  it  to  False  makes the generation faster.
+        Default is True
+
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
     
     Returns
     -------
     
     str :
-        String containing the code of all the functions
+        String containing the code of all the functions (empty if out is
+        not None)
     
     """
 
-    code = ''
+    # Every matrix function is generated independently in a worker process.
+    # The forward and backward matrices of a joint are prepared together :
+    # they share the joint lookup and, most of the time, the parameters.
+    # The pretty printed matrices are kept on the joints for the next
+    # generations
+
+    columns = language.max_line_length - 4
+    ftm_args = {}
+    btm_args = {}
+    forward = set(list_ftm)
+    backward = set(list_btm)
+    for jj in dict.fromkeys(list_ftm + list_btm):
+        _, i_j = jj.split('_')
+        joint = robot.joints[int(i_j)]
+        parent = robot.links[joint.parent].name
+        child = robot.links[joint.child].name
+        params = get_parameters(joint.T_symbols)
+
+        if jj in forward:
+            docstr = (f"Transition Matrix to go from link {parent} to link "
+                      f"{child}.\nThis joint is {joint.joint_type}")
+            ftm_args[jj] = (joint.T, 'T_' + joint.name, docstr, language, '',
+                            pretty_docstrings, params,
+                            joint.pretty_cache.get(('T', columns)))
+
+        if jj in backward:
+            # Tinv is simplified : it may have lost some symbols of T
+            if joint.Tinv_symbols is not joint.T_symbols:
+                params = get_parameters(joint.Tinv_symbols)
+            docstr = (f"Transition Matrix to go from link {child} to link "
+                      f"{parent}.\nThis joint is {joint.joint_type}")
+            btm_args[jj] = (joint.Tinv, 'T_' + joint.name + '_inv', docstr,
+                            language, '\n', pretty_docstrings, params,
+                            joint.pretty_cache.get(('Tinv', columns)))
+
+    # A single pool for both directions
+    jobs = [(jj, 'T') for jj in list_ftm] + [(jj, 'Tinv') for jj in list_btm]
+    results = _map_processes(_generate_transition_matrix,
+                             [(ftm_args if name == 'T' else btm_args)[jj]
+                              for jj, name in jobs],
+                             "Generating Transition Matrix",
+                             progressbar, progress_increment)
+
+    codes = []
+    for (jj, name), (joint_str, pretty_T) in zip(jobs, results):
+        codes.append(joint_str)
+        if pretty_T is not None:
+            joint = robot.joints[int(jj.split('_')[1])]
+            joint.pretty_cache[(name, columns)] = pretty_T
+    ftm_codes = codes[:len(list_ftm)]
+    btm_codes = codes[len(list_ftm):]
+
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
 
     if list_ftm:
-        code += language.title('FORWARD TRANSITION MATRICES', 0)
+        write(language.title('FORWARD TRANSITION MATRICES', 0))
 
-        code += '\n\n'
+        write('\n\n')
 
     # For every joint ........................................................
 
-    kk = 1
-    for jj in list_ftm:
-        print(f"Generating Forward Transition Matrix {kk}/{len(list_ftm)}")
+    for jj, joint_str in zip(list_ftm, ftm_codes):
         _, i_j = jj.split('_')
-        i_j = int(i_j)
-        joint = robot.joints[i_j]
-
-        code += language.title('Joint ' + str(i_j), 1) + '\n\n'
-
-        # Function name
-        fname = 'T_' + joint.name
-
-        # Docstring
-        docstr = "Transition Matrix to go from link "
-        docstr += robot.links[joint.parent].name + ' to link '
-        docstr += robot.links[joint.child].name + '.\nThis joint is '
-        docstr += joint.joint_type + '. The matrix is :\n\n'
-        docstr += pretty(joint.T, num_columns=language.max_line_length - 4,
-                         use_unicode=False)
 
-        joint_str = generate_code_from_sym_mat(joint.T, fname,
-                                               language, docstr)
+        write(language.title('Joint ' + i_j, 1) + '\n\n')
 
-        code += joint_str + '\n\n'
-
-        increment_progressbar(progressbar, progress_increment)
-        kk += 1
+        write(joint_str + '\n\n')
 
     if list_btm:
-        code += language.title('BACKWARD TRANSITION MATRICES', 0)
+        write(language.title('BACKWARD TRANSITION MATRICES', 0))
 
-        code += '\n\n'
+        write('\n\n')
 
     # For every joint ........................................................
 
-    kk = 1
-    for jj in list_btm:
-        print(f"Generating Backward Transition Matrix {kk}/{len(list_ftm)}")
+    for jj, joint_str in zip(list_btm, btm_codes):
         _, i_j = jj.split('_')
         i_j = int(i_j)
-        joint = robot.joints[i_j]
-
-        T = joint.Tinv
-
-        code += language.title('Joint ' + str(i_j) + ' Inverse', 1) + '\n\n'
 
-        # Function name
-        fname = 'T_' + joint.name + '_inv'
+        write(language.title('Joint ' + str(i_j) + ' Inverse', 1) + '\n\n')
 
-        # Docstring
-        docstr = "Transition Matrix to go from link "
-        docstr += robot.links[joint.child].name + ' to link '
-        docstr += robot.links[joint.parent].name + '.\nThis joint is '
-        docstr += joint.joint_type + '. The matrix is :\n\n'
-        docstr += pretty(T, num_columns=language.max_line_length - 4,
-                         use_unicode=False) + '\n'
-
-        joint_str = generate_code_from_sym_mat(T, fname, language, docstr)
-
-        code += joint_str
+        write(joint_str)
         if i_j < len(robot.joints) - 1:
-            code += '\n\n'
+            write('\n\n')
 
-        increment_progressbar(progressbar, progress_increment)
-        kk += 1
-
-    return code
+    return ''.join(code)
 
 
 # Generate Forward Kinematics ________________________________________________
@@ -327,10 +626,9 @@ def generate_fk(robot, origin, destination, content, optimization_level,
     
     """
 
-    # Adding Title
-    code = language.title('Forward Kinematics from ' + origin + ' to ' +
-                          destination, 1)
-    code += '\n\n'
+    # Adding Title (code pieces, joined at the end)
+    code = [language.title('Forward Kinematics from ' + origin + ' to ' +
+                           destination, 1), '\n\n']
 
     # Function properties ....................................................
 
@@ -385,19 +683,12 @@ def generate_fk(robot, origin, destination, content, optimization_level,
         joint = robot.joints[up_joint_nb]
 
         # Parameters
-        all_sym = joint.T.free_symbols
-        all_sym.sort(key=lambda x: str(x))
+        all_sym = joint.T_symbols
         params_tmp = get_parameters(all_sym)
-        params += get_parameters(all_sym)
+        params += params_tmp
 
-        val = 'MATLAB_PREFIXT_' + joint.name + '_inv('
-
-        for i_p, par in enumerate(params_tmp):
-            val += par['name']
-            if i_p < len(params_tmp) - 1:
-                val += ','
-            else:
-                val += ')'
+        args = ','.join(par['name'] for par in params_tmp)
+        val = f'MATLAB_PREFIXT_{joint.name}_inv({args})'
 
         variable = {'name': 'MATLAB_PREFIXT_' + str(up_joint_nb) + '_inv',
                     'value': val,
@@ -408,19 +699,11 @@ def generate_fk(robot, origin, destination, content, optimization_level,
     for down_joint_nb in downwards:
         joint = robot.joints[down_joint_nb]
         # Parameters
-        all_sym = joint.T.free_symbols
+        all_sym = joint.T_symbols
         params_tmp = get_parameters(all_sym)
-        params += get_parameters(all_sym)
-        val = 'MATLAB_PREFIXT_' + joint.name + '('
-
-        params_tmp.sort(key=lambda x: x['name'])
-
-        for i_p, par in enumerate(params_tmp):
-            val += par['name']
-            if i_p < len(params_tmp) - 1:
-                val += ','
-            else:
-                val += ')'
+        params += params_tmp
+        args = ','.join(par['name'] for par in params_tmp)
+        val = f'MATLAB_PREFIXT_{joint.name}({args})'
 
         variable = {'name': 'MATLAB_PREFIXT_' + str(down_joint_nb),
                     'value': val,
@@ -432,20 +715,48 @@ def generate_fk(robot, origin, destination, content, optimization_level,
                     'value': '___eye__4__4___',
                     'type': 'mat'}
         varss.append(variable)
-    expr = ''
-    for i_v, var in enumerate(varss):
-
-        expr += str(var['name'])
-        if i_v < len(varss) - 1:
-            expr += '@'
+    expr = '@'.join(str(var['name']) for var in varss)
 
     params.sort(key=lambda x: x['name'])
 
-    code += language.generate_fct("mat", fname, params, expr, varss, docstr,
-                                  matrix_dims=(1, 1), input_is_vector=True,
-                                  dof=robot.dof)
+    language._generate_fct_into(code, "mat", fname, params, expr, varss,
+                                docstr, matrix_dims=(1, 1),
+                                input_is_vector=True, dof=robot.dof)
 
-    return code
+    return ''.join(code)
+
+
+# Generate a FK in a worker process __________________________________________
+
+def _generate_fk(robot, origin, destination, content, language,
+                 optimization_level):
+    """
+    Description
+    -----------
+
+    Same  as  generate_fk,  for  the  worker  processes of generate_all_fk.
+    The  FK  saved in the copy of robot are returned, to be saved in the
+    original robot.
+
+    Parameters
+    ----------
+
+    See generate_fk.
+
+    Returns
+    -------
+
+    str :
+        Generated code of the FK
+
+    dict :
+        robot.saved_fk of the worker
+
+    """
+
+    code = generate_fk(robot, origin, destination, content,
+                       optimization_level, language=language)
+    return code, robot.saved_fk
 
 
 # Generate all FK functions __________________________________________________
@@ -454,7 +765,8 @@ def generate_all_fk(robot, list_origin, list_dest, list_content,
                     optimization_level,
                     language=Language('python'),
                     progressbar=None,
-                    progress_increment=0):
+                    progress_increment=0,
+                    out=None):
     """
     Description
     -----------
@@ -514,34 +826,59 @@ def generate_all_fk(robot, list_origin, list_dest, list_content,
     progress_increment : float
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
+
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
         
     Returns
     -------
     
     str :
         String  containing the forward kinematics function in the language you
-        want
+        want (empty if out is not None)
     
     """
 
     if len(list_origin) == 0:
         return ''
 
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
+
     # Adding Title
-    code = language.title("FORWARD KINEMATICS", 0)
-    code += '\n\n'
+    write(language.title("FORWARD KINEMATICS", 0))
+    write('\n\n')
 
-    for i, origin, in enumerate(list_origin):
-        print(f"Generating Forward Kinematics {i + 1}/{len(list_origin)}")
-        code += generate_fk(robot, origin, list_dest[i],
-                            list_content[i], optimization_level,
-                            language=language)
-        if i < len(list_origin) - 1:
-            code += '\n\n'
+    # Only the FK that have not been generated with the same options yet
+    keys = [('fk', origin, list_dest[i], list_content[i], optimization_level,
+             language.cache_key) for i, origin in enumerate(list_origin)]
+    missing = [i for i, key in enumerate(keys) if key not in robot.saved_code]
 
-        increment_progressbar(progressbar, progress_increment)
+    # The FK are generated independently in worker processes. The FK they
+    # compute are saved back in robot (the Jacobians reuse them)
+    results = _map_processes(_generate_fk,
+                             [(robot, list_origin[i], list_dest[i],
+                               list_content[i], language, optimization_level)
+                              for i in missing],
+                             "Generating Forward Kinematics",
+                             progressbar, progress_increment)
 
-    return code
+    for i, (fk_code, saved_fk) in zip(missing, results):
+        _merge_saved(robot.saved_fk, saved_fk)
+        robot.saved_code[keys[i]] = fk_code
+
+    advance = progressbar_incrementer(progressbar, progress_increment)
+    for _ in range(len(keys) - len(missing)):
+        advance()
+
+    for i, key in enumerate(keys):
+        if i > 0:
+            write('\n\n')
+        write(robot.saved_code[key])
+
+    return ''.join(code)
 
 
 # Generate Jacobian Function _________________________________________________
@@ -607,10 +944,9 @@ def generate_jacobian(robot, origin, destination, content,
     
     """
 
-    # Adding Title
-    code = language.title('Jacobian of the ' + destination + ' position ' +
-                          'and orientation', 1)
-    code += '\n\n'
+    # Adding Title (code pieces, joined at the end)
+    code = [language.title('Jacobian of the ' + destination + ' position ' +
+                           'and orientation', 1), '\n\n']
     jac = None
 
     # Jacobian function parameters
@@ -634,20 +970,12 @@ def generate_jacobian(robot, origin, destination, content,
             joint = robot.joints[up_joint_nb]
 
             # Paramters
-            all_sym = joint.T.free_symbols
+            all_sym = joint.T_symbols
             params_tmp = get_parameters(all_sym)
-            params += get_parameters(all_sym)
-
-            val = 'MATLAB_PREFIXT_' + joint.name + '_inv('
-
-            params_tmp.sort(key=lambda x: x['name'])
+            params += params_tmp
 
-            for i_p, par in enumerate(params_tmp):
-                val += par['name']
-                if i_p < len(params_tmp) - 1:
-                    val += ','
-                else:
-                    val += ')'
+            args = ','.join(par['name'] for par in params_tmp)
+            val = f'MATLAB_PREFIXT_{joint.name}_inv({args})'
 
             T_fcts.append([f'MATLAB_PREFIXT_{up_joint_nb}_inv', val])
 
@@ -655,19 +983,11 @@ def generate_jacobian(robot, origin, destination, content,
         for down_joint_nb in downwards:
             joint = robot.joints[down_joint_nb]
             # Parameters
-            all_sym = joint.T.free_symbols
+            all_sym = joint.T_symbols
             params_tmp = get_parameters(all_sym)
-            params += get_parameters(all_sym)
-            val = 'MATLAB_PREFIXT_' + joint.name + '('
-
-            params_tmp.sort(key=lambda x: x['name'])
-
-            for i_p, par in enumerate(params_tmp):
-                val += par['name']
-                if i_p < len(params_tmp) - 1:
-                    val += ','
-                else:
-                    val += ')'
+            params += params_tmp
+            args = ','.join(par['name'] for par in params_tmp)
+            val = f'MATLAB_PREFIXT_{joint.name}({args})'
 
             T_fcts.append(['MATLAB_PREFIXT_' + str(down_joint_nb), val])
 
@@ -683,12 +1003,16 @@ def generate_jacobian(robot, origin, destination, content,
                       'value': f'{T_fcts[0][1]}',
                       'type': 'mat'})
 
+        # Position and z axis of T, the same for every column
+        T_position = language.slice_mat("T", 0, 2, 3, None)
+        T_z = language.slice_mat("T", 0, 2, 2, None)
+
         varss.append({'name': 'L',
-                      'value': f'p0-{language.slice_mat("T", 0, 2, 3, None)}',
+                      'value': f'p0-{T_position}',
                       'type': 'mat'})
 
         varss.append({'name': 'Z',
-                      'value': language.slice_mat("T", 0, 2, 2, None),
+                      'value': T_z,
                       'type': 'mat'})
 
         # Compute Jacobian column 1:3
@@ -709,12 +1033,11 @@ def generate_jacobian(robot, origin, destination, content,
 
             # Compute L
             varss.append({'name': 'L',
-                          'value':
-                              f"p0-{language.slice_mat('T', 0, 2, 3, None)}",
+                          'value': f"p0-{T_position}",
                           'type': ''})
             # Compute Z
             varss.append({'name': 'Z',
-                          'value': language.slice_mat("T", 0, 2, 2, None),
+                          'value': T_z,
                           'type': ''})
 
             # Compute Jacobian column 1:3
@@ -781,22 +1104,90 @@ def generate_jacobian(robot, origin, destination, content,
     fname = 'jacobian_' + origin_name + '_to_' + dest_name + "_" + content
 
     if optimization_level == 0:
-        for i_v, var in enumerate(varss):
-            for i_p, param in enumerate(params):
-                qp = language.\
-                    slice_mat("q", robot.dof.index(Symbol(param['name'])),
-                              None, None, None)
-                varss[i_v]['value'] = replace_var(var['value'],
-                                                  param['name'], qp)
-        code += language.generate_fct("mat", fname, parameters, expr, varss,
-                                      docstr,
-                                      matrix_dims=(1, 1))
+        # Replacing every parameter by its q element
+        _replace_parameters(varss, {param['name']: language.slice_mat(
+            "q", robot.dof.index(Symbol(param['name'])), None, None, None)
+            for param in params})
+        language._generate_fct_into(code, "mat", fname, parameters, expr,
+                                    varss, docstr, matrix_dims=(1, 1))
     else:
-        code += generate_code_from_sym_mat(jac, fname, language, docstr,
-                                           input_is_vector=True,
-                                           dof=robot.dof)
+        code.append(generate_code_from_sym_mat(jac, fname, language, docstr,
+                                               input_is_vector=True,
+                                               dof=robot.dof))
 
-    return code
+    return ''.join(code)
+
+
+# Generate a Jacobian in a worker process ____________________________________
+
+def _generate_jacobian(robot, origin, destination, content, language,
+                       optimization_level):
+    """
+    Description
+    -----------
+
+    Same  as  generate_jacobian,  for  the  worker  processes  of
+    generate_all_jac.  The  results  saved  in  the  copy of robot are
+    returned, to be saved in the original robot.
+
+    Parameters
+    ----------
+
+    See generate_jacobian.
+
+    Returns
+    -------
+
+    str :
+        Generated code of the Jacobian
+
+    dict :
+        robot.saved_fk of the worker
+
+    dict :
+        robot.saved_jac of the worker
+
+    """
+
+    code = generate_jacobian(robot, origin, destination, content,
+                             language=language,
+                             optimization_level=optimization_level)
+    return code, robot.saved_fk, robot.saved_jac
+
+
+# Merge saved FK / Jacobians _________________________________________________
+
+def _merge_saved(saved, computed):
+    """
+    Description
+    -----------
+
+    Adds  the  results  of  computed to saved (robot.saved_fk or
+    robot.saved_jac  format).  A  result  already  in  saved  is  only
+    replaced by a result with a higher optimization level.
+
+    Parameters
+    ----------
+
+    saved : dict of dict of list
+        Saved results, modified in place
+
+    computed : dict of dict of list
+        Results to add
+
+    Returns
+    -------
+
+    None.
+
+    """
+
+    for origin, by_destination in computed.items():
+        saved_origin = saved.setdefault(origin, {})
+        for destination, (value, level) in by_destination.items():
+            if destination not in saved_origin or \
+                    saved_origin[destination][1] < level:
+                saved_origin[destination] = [value, level]
 
 
 # Generate all Jacobian Matrices _____________________________________________
@@ -805,7 +1196,8 @@ def generate_all_jac(robot, list_origin, list_dest, list_content,
                      optimization_level,
                      language=Language('python'),
                      progressbar=None,
-                     progress_increment=0):
+                     progress_increment=0,
+                     out=None):
     """
     Description
     -----------
@@ -860,35 +1252,62 @@ def generate_all_jac(robot, list_origin, list_dest, list_content,
     progress_increment : float
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
+
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
         
     Returns
     -------
     
     str :
         String  containing the jacobian functions in the language you want
+        (empty if out is not None)
     
     """
 
     if len(list_origin) == 0:
         return ''
 
-    # Adding Title
-    code = language.title("JACOBIANS", 0)
-    code += '\n\n'
-
-    for i, origin, in enumerate(list_origin):
-
-        print(f"Generating Jacobian {i+1}/{len(list_origin)}")
-        code += generate_jacobian(robot, origin, list_dest[i],
-                                  list_content[i],
-                                  optimization_level=optimization_level,
-                                  language=language)
-        if i < len(list_origin) - 1:
-            code += '\n\n'
-
-        increment_progressbar(progressbar, progress_increment)
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
 
-    return code
+    # Adding Title
+    write(language.title("JACOBIANS", 0))
+    write('\n\n')
+
+    # Only the Jacobians that have not been generated with the same options
+    # yet
+    keys = [('jac', origin, list_dest[i], list_content[i],
+             optimization_level, language.cache_key)
+            for i, origin in enumerate(list_origin)]
+    missing = [i for i, key in enumerate(keys) if key not in robot.saved_code]
+
+    # The Jacobians are generated independently in worker processes. The
+    # FK and Jacobians they compute are saved back in robot
+    results = _map_processes(_generate_jacobian,
+                             [(robot, list_origin[i], list_dest[i],
+                               list_content[i], language, optimization_level)
+                              for i in missing],
+                             "Generating Jacobian",
+                             progressbar, progress_increment)
+
+    for i, (jac_code, saved_fk, saved_jac) in zip(missing, results):
+        _merge_saved(robot.saved_fk, saved_fk)
+        _merge_saved(robot.saved_jac, saved_jac)
+        robot.saved_code[keys[i]] = jac_code
+
+    advance = progressbar_incrementer(progressbar, progress_increment)
+    for _ in range(len(keys) - len(missing)):
+        advance()
+
+    for i, key in enumerate(keys):
+        if i > 0:
+            write('\n\n')
+        write(robot.saved_code[key])
+
+    return ''.join(code)
 
 
 # Generate Center of Mass Position ___________________________________________
@@ -923,11 +1342,15 @@ def generate_com(robot, content,
 
     """
 
+    # Already generated code
+    key = ('com', content, optimization_level, language.cache_key)
+    if key in robot.saved_code:
+        return robot.saved_code[key]
+
     print(f"Generating Center of Mass")
 
-    # Adding Title
-    code = language.title("Center of Mass of the Robot", 1)
-    code += '\n\n'
+    # Adding Title (code pieces, joined at the end)
+    code = [language.title("Center of Mass of the Robot", 1), '\n\n']
 
     # Total Mass of the robot ................................................
 
@@ -958,9 +1381,22 @@ def generate_com(robot, content,
 
         last_u = 0
 
-        for node in PreOrderIter(robot.tree.node):
-            obj_type = node.name.split('_')[0]
-            obj_nb = int(node.name.split('_')[1])
+        def append_T(value):
+            # A T that is overwritten right away (without being used in the
+            # new value) is useless : it is replaced. A run of products
+            # T@T_fct is fused into a single product
+            typ = ''
+            if varss[-1]['name'] == 'T':
+                previous = varss.pop()
+                typ = previous['type']
+                if value.startswith('T@'):
+                    if previous['value'] == '___eye__4__4___':
+                        value = value[2:]
+                    else:
+                        value = previous['value'] + value[1:]
+            varss.append({'name': 'T', 'value': value, 'type': typ})
+
+        for obj_type, obj_nb in robot.nodes:
 
             if obj_type == 'link':
                 relative_mass = robot.links[obj_nb].mass / mass
@@ -968,14 +1404,15 @@ def generate_com(robot, content,
                 if relative_mass == 0:
                     continue
                 cm = robot.links[obj_nb].com
-                pos_val = f'#mat#4#1#{str(cm[0, 0])}#{str(cm[1, 0])}#' + \
-                          f'{str(cm[2, 0])}#1.0#endmat&'
+                # The relative mass is a constant of the weighted sum : it
+                # is applied to the CoM of the link instead of T
+                pos_val = _homogeneous_vector(cm, relative_mass)
                 pos_var = {'name': f'com_{obj_nb}_xyz',
                            'value': pos_val,
                            'type': 'vect'}
                 varss.append(pos_var)
                 var = {'name': f'com_{obj_nb}',
-                       'value': f'{relative_mass}*T@com_{obj_nb}_xyz',
+                       'value': f'T@com_{obj_nb}_xyz',
                        'type': 'vect'}
                 varss.append(var)
                 expr += f'+com_{obj_nb}'
@@ -986,18 +1423,11 @@ def generate_com(robot, content,
                 joint = robot.joints[obj_nb]
 
                 # Parameters
-                all_sym = joint.T.free_symbols
+                all_sym = joint.T_symbols
                 params_tmp = get_parameters(all_sym)
-                params += get_parameters(all_sym)
-                T_fct = 'MATLAB_PREFIXT_' + joint.name + '('
-
-                params_tmp.sort(key=lambda x: x['name'])
-
-                for i_p, par in enumerate(params_tmp):
-                    T_fct += par['name']
-                    if i_p < len(params_tmp) - 1:
-                        T_fct += ','
-                T_fct += ')'
+                params += params_tmp
+                args = ','.join(par['name'] for par in params_tmp)
+                T_fct = f'MATLAB_PREFIXT_{joint.name}({args})'
 
                 if len(robot.links[joint.child].parent_joints) > 1:
                     var2 = {'name': f'MATLAB_PREFIXT_{obj_nb}',
@@ -1005,40 +1435,16 @@ def generate_com(robot, content,
                             'type': 'mat'}
                     varss.append(var2)
                     saved_joints_T.append(obj_nb)
-                    var = {'name': 'T',
-                           'value': f'MATLAB_PREFIXT_{obj_nb}',
-                           'type': ''}
-                    varss.append(var)
+                    append_T(f'MATLAB_PREFIXT_{obj_nb}')
 
                 elif any(x in robot.links[joint.parent].child_joints for x in \
                          saved_joints_T):
                     num = robot.links[joint.parent].child_joints[0]
-                    var = {'name': 'T',
-                           'value': f'MATLAB_PREFIXT_{num}@{T_fct}',
-                           'type': ''}
-                    varss.append(var)
+                    append_T(f'MATLAB_PREFIXT_{num}@{T_fct}')
                 else:
-                    var = {'name': 'T',
-                           'value': f'T@{T_fct}',
-                           'type': ''}
-                    varss.append(var)
-        # Removing useless variables
-        to_remove = []
-        last_T = None
-        T_nb = 0
-        for i_v, var in enumerate(varss):
-            if var['name'] == 'T':
-                if last_T == i_v - 1 and var['value'][:2] != 'T@':
-                    to_remove.append(last_T)
-                    if T_nb == 2:
-                        varss[i_v]['value'] = varss[i_v]['value'][2:]
-                        varss[i_v]['type'] = 'mat'
-                last_T = i_v
-
+                    append_T(f'T@{T_fct}')
+        # Removing the variables after the last link
         varss = varss[:last_u]
-        to_remove.sort(reverse=True)
-        for rem in to_remove:
-            varss.pop(rem)
     else:
         com = robot.com(content, optimization_level)
 
@@ -1058,13 +1464,9 @@ def generate_com(robot, content,
 
     paramq = {'name': 'q', 'type': 'vect', 'description': descrq}
 
-    for i_v, var in enumerate(varss):
-        for i_p, param in enumerate(params):
-            if not varss[i_v]['value'][0] == '#':
-                varss[i_v]['value'] = \
-                    replace_var(var['value'], param['name'],
-                                language.slice_mat("q", i_p, None, None,
-                                                   None))
+    _replace_parameters(varss, {
+        param['name']: language.slice_mat("q", i_p, None, None, None)
+        for i_p, param in enumerate(params)}, skip_special=True)
 
     if optimization_level == 0:
         dimensions = (f'(4 x 1) {language.matrix_type} in homogeneous '
@@ -1079,14 +1481,16 @@ def generate_com(robot, content,
              f' is returned as a {dimensions}'
 
     if optimization_level == 0:
-        code += language.generate_fct("mat", f'com_{content}', [paramq],
-                                      expr[1:], varss,
-                                      docstr, matrix_dims=(1, 1))
+        language._generate_fct_into(code, "mat", f'com_{content}',
+                                    [paramq], expr[1:], varss,
+                                    docstr, matrix_dims=(1, 1))
     else:
-        code += generate_code_from_sym_mat(com, f'com_{content}', language,
-                                           docstr,
-                                           input_is_vector=True,
-                                           dof=robot.dof)
+        code.append(generate_code_from_sym_mat(com, f'com_{content}',
+                                               language, docstr,
+                                               input_is_vector=True,
+                                               dof=robot.dof))
+    code = ''.join(code)
+    robot.saved_code[key] = code
     return code
 
 
@@ -1094,7 +1498,7 @@ def generate_com(robot, content,
 
 def generate_all_coms(robot, list_content,
                       optimization_level, language=Language('python'),
-                      progressbar=None, progress_increment=0):
+                      progressbar=None, progress_increment=0, out=None):
     """
     Generate all the CoMs functions.
 
@@ -1125,20 +1529,29 @@ def generate_all_coms(robot, list_content,
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
 
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
+
     Returns
     -------
 
     code : str
-        Generated code of all the CoMs
+        Generated code of all the CoMs (empty if out is not None)
 
     """
 
-    code = language.title("Center of Mass", 0)
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
+
+    write(language.title("Center of Mass", 0))
+    advance = progressbar_incrementer(progressbar, progress_increment)
     for com in list_content:
-        code += generate_com(robot, com, optimization_level, language)
-        code += "\n\n"
-        increment_progressbar(progressbar, progress_increment)
-    return code
+        write(generate_com(robot, com, optimization_level, language))
+        write("\n\n")
+        advance()
+    return ''.join(code)
 
 
 # Generate Center of Mass Jacobian ___________________________________________
@@ -1176,11 +1589,16 @@ def generate_com_jacobian(robot, optimization_level,
 
     """
 
+    # Already generated code
+    key = ('com_jac', content, optimization_level, language.cache_key)
+    if key in robot.saved_code:
+        return robot.saved_code[key]
+
     print(f"Generating Center of Mass Jacobian")
 
-    # Adding Title
-    code = language.title("Jacobian of the Center of Mass of the Robot", 1)
-    code += '\n\n'
+    # Adding Title (code pieces, joined at the end)
+    code = [language.title("Jacobian of the Center of Mass of the Robot", 1),
+            '\n\n']
 
     params = []
     varss = []
@@ -1222,9 +1640,22 @@ def generate_com_jacobian(robot, optimization_level,
         i_jac = 0
         last_u = 0
 
-        for node in PreOrderIter(robot.tree.node):
-            obj_type = node.name.split('_')[0]
-            obj_nb = int(node.name.split('_')[1])
+        def append_T(value):
+            # A T that is overwritten right away (without being used in the
+            # new value) is useless : it is replaced. A run of products
+            # T@T_fct is fused into a single product
+            typ = ''
+            if varss[-1]['name'] == 'T':
+                previous = varss.pop()
+                typ = previous['type']
+                if value.startswith('T@'):
+                    if previous['value'] == '___eye__4__4___':
+                        value = value[2:]
+                    else:
+                        value = previous['value'] + value[1:]
+            varss.append({'name': 'T', 'value': value, 'type': typ})
+
+        for obj_type, obj_nb in robot.nodes:
 
             if obj_type == 'link':
                 relative_mass = robot.links[obj_nb].mass / mass
@@ -1232,8 +1663,7 @@ def generate_com_jacobian(robot, optimization_level,
                 if relative_mass == 0:
                     continue
                 cm = robot.links[obj_nb].com
-                pos_val = f'#mat#4#1#{str(cm[0, 0])}#{str(cm[1, 0])}#' + \
-                          f'{str(cm[2, 0])}#1.0#endmat&'
+                pos_val = _homogeneous_vector(cm)
                 pos_var = {'name': f'com_{obj_nb}_xyz',
                            'value': pos_val,
                            'type': 'vect'}
@@ -1267,19 +1697,11 @@ def generate_com_jacobian(robot, optimization_level,
                 joint = robot.joints[obj_nb]
 
                 # Parameters
-                all_sym = joint.T.free_symbols
+                all_sym = joint.T_symbols
                 params_tmp = get_parameters(all_sym)
-                params += get_parameters(all_sym)
-                T_fct = 'MATLAB_PREFIXT_' + joint.name + '('
-
-                params_tmp.sort(key=lambda x: x['name'])
-
-                for i_p, par in enumerate(params_tmp):
-                    T_fct += par['name']
-                    if i_p < len(params_tmp) - 1:
-                        T_fct += ','
-                    else:
-                        T_fct += ')'
+                params += params_tmp
+                args = ','.join(par['name'] for par in params_tmp)
+                T_fct = f'MATLAB_PREFIXT_{joint.name}({args})'
 
                 if len(robot.links[joint.child].parent_joints) > 1:
                     var2 = {'name': f'MATLAB_PREFIXT_{obj_nb}',
@@ -1287,42 +1709,17 @@ def generate_com_jacobian(robot, optimization_level,
                             'type': 'mat'}
                     varss.append(var2)
                     saved_joints_T.append(obj_nb)
-                    var = {'name': 'T',
-                           'value': f'MATLAB_PREFIXT_{obj_nb}',
-                           'type': ''}
-                    varss.append(var)
+                    append_T(f'MATLAB_PREFIXT_{obj_nb}')
 
                 elif any(x in robot.links[joint.parent].child_joints for x in \
                          saved_joints_T):
                     num = robot.links[joint.parent].child_joints[0]
-                    var = {'name': 'T',
-                           'value': f'MATLAB_PREFIXT_{num}@{T_fct}',
-                           'type': ''}
-                    varss.append(var)
+                    append_T(f'MATLAB_PREFIXT_{num}@{T_fct}')
                 else:
-                    var = {'name': 'T',
-                           'value': f'T@{T_fct}',
-                           'type': ''}
-                    varss.append(var)
-
-        # Removing useless variables
-        to_remove = []
-        last_T = None
-        T_nb = 0
-        for i_v, var in enumerate(varss):
-            if var['name'] == 'T':
-                T_nb += 1
-                if last_T == i_v - 1 and var['value'][:2] != 'T@':
-                    to_remove.append(last_T)
-                    if T_nb == 2:
-                        varss[i_v]['value'] = varss[i_v]['value'][2:]
-                        varss[i_v]['type'] = 'mat'
-                last_T = i_v
+                    append_T(f'T@{T_fct}')
 
+        # Removing the variables after the last link
         varss = varss[:last_u]
-        to_remove.sort(reverse=True)
-        for rem in to_remove:
-            varss.pop(rem)
     else:
         jac = robot.com_jacobian(content, optimization_level)
         all_sym = robot.dof
@@ -1339,12 +1736,9 @@ def generate_com_jacobian(robot, optimization_level,
 
     paramq = {'name': 'q', 'type': 'vect', 'description': descrq}
 
-    for i_v, var in enumerate(varss):
-        for i_p, param in enumerate(params):
-            varss[i_v]['value'] = replace_var(var['value'], param['name'],
-                                              language.slice_mat("q", i_p,
-                                                                 None, None,
-                                                                 None))
+    _replace_parameters(varss, {
+        param['name']: language.slice_mat("q", i_p, None, None, None)
+        for i_p, param in enumerate(params)})
     paar = [paramq]
     if optimization_level == 0:
         param_com0 = {'name': 'com0',
@@ -1385,15 +1779,17 @@ def generate_com_jacobian(robot, optimization_level,
                   f'{param.name}'
 
     if optimization_level == 0:
-        code += language.generate_fct("mat", f'jacobian_com_{content}', paar,
-                                      expr,
-                                      varss,
-                                      docstr, matrix_dims=(1, 1))
+        language._generate_fct_into(code, "mat", f'jacobian_com_{content}',
+                                    paar, expr, varss,
+                                    docstr, matrix_dims=(1, 1))
     else:
-        code += generate_code_from_sym_mat(jac, f'jacobian_com_{content}',
-                                           language,
-                                           docstr, input_is_vector=True,
-                                           dof=robot.dof)
+        code.append(generate_code_from_sym_mat(jac,
+                                               f'jacobian_com_{content}',
+                                               language, docstr,
+                                               input_is_vector=True,
+                                               dof=robot.dof))
+    code = ''.join(code)
+    robot.saved_code[key] = code
     return code
 
 
@@ -1402,7 +1798,8 @@ def generate_com_jacobian(robot, optimization_level,
 def generate_all_com_jac(robot, list_content, optimization_level,
                          language=Language('python'),
                          progressbar=None,
-                         progress_increment=0):
+                         progress_increment=0,
+                         out=None):
     """
     Generate the code for all the jacobian of the center of mass of the robot
 
@@ -1435,21 +1832,132 @@ def generate_all_com_jac(robot, list_content, optimization_level,
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
 
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
+
 
     Returns
     -------
     str :
-        Code of the CoM Jacobian functions in the desired language
+        Code of the CoM Jacobian functions in the desired language (empty if
+        out is not None)
 
     """
 
-    code = language.title("Center of Mass Jacobians", 0)
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
+
+    write(language.title("Center of Mass Jacobians", 0))
+    advance = progressbar_incrementer(progressbar, progress_increment)
     for com in list_content:
-        code += generate_com_jacobian(robot, optimization_level, language,
-                                      content=com)
-        code += "\n\n"
-        increment_progressbar(progressbar, progress_increment)
-    return code
+        write(generate_com_jacobian(robot, optimization_level, language,
+                                    content=com))
+        write("\n\n")
+        advance()
+    return ''.join(code)
+
+
+# Generate the CoM functions in worker processes _____________________________
+
+def _generate_com_code(robot, jacobian, content, optimization_level,
+                       language):
+    """
+    Description
+    -----------
+
+    Generates  the code of the center of mass (or of its jacobian) in a
+    worker  process  of  _generate_coms_in_processes.  The  results saved
+    in the copy of robot are returned, to be saved in the original robot.
+
+    Parameters
+    ----------
+
+    robot : robots.Robot
+        Robot you want to generate the center of mass function from
+
+    jacobian : bool
+        True  to  generate  the  jacobian  of the center of mass, False to
+        generate the center of mass
+
+    content, optimization_level, language :
+        See generate_com
+
+    Returns
+    -------
+
+    list or None :
+        robot.saved_com of the worker
+
+    list or None :
+        robot.saved_com_jac of the worker
+
+    dict :
+        robot.saved_code of the worker
+
+    """
+
+    if jacobian:
+        generate_com_jacobian(robot, optimization_level, language,
+                              content=content)
+    else:
+        generate_com(robot, content, optimization_level, language)
+    return robot.saved_com, robot.saved_com_jac, robot.saved_code
+
+
+def _generate_coms_in_processes(robot, list_com, list_com_jac,
+                                optimization_level, language):
+    """
+    Description
+    -----------
+
+    Generates  all  the  center  of mass and center of mass jacobian
+    functions  at  the  same time in worker processes. Their code is saved
+    in  robot.saved_code  :  generate_all_coms  and  generate_all_com_jac
+    then  return  it  without  generating  it again. Nothing is done when
+    the functions would not run in parallel (see _use_processes) : they
+    are then generated in their own sections.
+
+    Parameters
+    ----------
+
+    robot : robots.Robot
+        Robot you want to generate the center of mass functions from
+
+    list_com, list_com_jac : list of str
+        Contents  of  the  center  of mass and center of mass jacobian
+        functions (see generate_all_coms and generate_all_com_jac)
+
+    optimization_level, language :
+        See generate_com
+
+    Returns
+    -------
+
+    None.
+
+    """
+
+    list_args = [(robot, False, content, optimization_level, language)
+                 for content in list_com] + \
+                [(robot, True, content, optimization_level, language)
+                 for content in list_com_jac]
+    if not _use_processes(len(list_args)):
+        return
+
+    results = _map_processes(_generate_com_code, list_args,
+                             "Generating Center of Mass")
+
+    for saved_com, saved_com_jac, saved_code in results:
+        if saved_com is not None and (robot.saved_com is None or
+                                      saved_com[1] > robot.saved_com[1]):
+            robot.saved_com = saved_com
+        if saved_com_jac is not None and \
+                (robot.saved_com_jac is None or
+                 saved_com_jac[1] > robot.saved_com_jac[1]):
+            robot.saved_com_jac = saved_com_jac
+        robot.saved_code.update(saved_code)
 
 
 # Generate Polynomial trajectory _____________________________________________
@@ -1573,6 +2081,10 @@ def generate_polynomial_trajectory(conditions, function_name, language):
 
     # Conditions -> Polynomial ...............................................
 
+    # Only needed here : imported on first use, not with the module
+    from polynomial_trajectory import get_solution, verify_solution, \
+        get_equations
+
     sym_vars, derivatives, equations = get_equations(conditions_,
                                                      Symbol('t'))
     solution = get_solution(equations, sym_vars, derivatives)
@@ -1584,7 +2096,8 @@ def generate_polynomial_trajectory(conditions, function_name, language):
 
     # Polynomials -> Code ....................................................
 
-    code = language.title("Trajectory " + function_name, 1) + '\n\n'
+    # Code pieces, joined at the end
+    code = [language.title("Trajectory " + function_name, 1), '\n\n']
     parameters_0 = []
     for i, polynomial in enumerate(solution):
         fname = "d" + str(i) + "_" + function_name
@@ -1610,19 +2123,21 @@ def generate_polynomial_trajectory(conditions, function_name, language):
         if i == 0:
             parameters_0 = parameters
 
-        varss, expr = optimize(str(polynomial))
+        varss, (expr,) = optimize_sym([polynomial])
 
-        code += language.generate_fct("mat", fname, parameters, expr, varss,
-                                      docstring, (1, 1), False) + '\n\n'
+        language._generate_fct_into(code, "mat", fname, parameters, expr,
+                                    varss, docstring, (1, 1), False)
+        code.append('\n\n')
 
-    return code, parameters_0
+    return ''.join(code), parameters_0
 
 
 # Generate all the polynomial trajectories ___________________________________
 
 def generate_all_polynomial_trajectories(trajectories, language,
                                          progressbar=None,
-                                         progress_increment=0):
+                                         progress_increment=0,
+                                         out=None):
     """
     Description
     -----------
@@ -1668,12 +2183,17 @@ def generate_all_polynomial_trajectories(trajectories, language,
         Progressbar  increment.  Default  is  0.  If progressbar is None, this
         parameter is ignored.
 
+    out : file object or None, optional
+        If  it  is  not  None, the code is written to out as it is generated
+        and an empty string is returned. Default is None
+
 
     Returns
     -------
 
     code : str
-        Code containing all the functions for each trajectory.
+        Code containing all the functions for each trajectory (empty if out
+        is not None).
 
         The generated code will be optimized automatically.
 
@@ -1690,18 +2210,23 @@ def generate_all_polynomial_trajectories(trajectories, language,
 
     """
 
-    code = "\n\n" + language.title("Polynomial Trajectories", 0) + "\n\n"
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
+
+    write("\n\n" + language.title("Polynomial Trajectories", 0) + "\n\n")
 
     poly_parameters = {}
+    advance = progressbar_incrementer(progressbar, progress_increment)
     for trajectory in trajectories:
         code_, par = generate_polynomial_trajectory(trajectory["conditions"],
                                                     trajectory["name"],
                                                     language)
-        code += code_
+        write(code_)
         poly_parameters[trajectory["name"]] = par
-        increment_progressbar(progressbar, progress_increment)
+        advance()
 
-    return code, poly_parameters
+    return ''.join(code), poly_parameters
 
 
 # Control loops ______________________________________________________________
@@ -2349,15 +2874,42 @@ def generate_all_control_loops(control_loops_list,
                                traj_parameters,
                                language,
                                progressbar=None,
-                               progress_increment=0):
-    code = "\n\n" + language.title("Control Loops", 0) + "\n\n"
+                               progress_increment=0,
+                               out=None):
+    # Code pieces, joined at the end (or written to out)
+    code = []
+    write = code.append if out is None else out.write
+
+    write("\n\n" + language.title("Control Loops", 0) + "\n\n")
 
+    advance = progressbar_incrementer(progressbar, progress_increment)
     for loop in control_loops_list:
-        code += generate_control_loop(loop, robot, traj_parameters, language)
-        code += "\n\n"
-        increment_progressbar(progressbar, progress_increment)
+        write(generate_control_loop(loop, robot, traj_parameters, language))
+        write("\n\n")
+        advance()
 
-    return code
+    return ''.join(code)
+
+
+# Output file of generate_everything ________________________________________
+
+class _PrefixedWriter:
+    """
+    Description
+    -----------
+
+    File  wrapper  replacing  the  MATLAB_PREFIX placeholder in every piece
+    of  code  written  to the file. It is passed as out to the generate_all_*
+    functions by generate_everything.
+
+    """
+
+    def __init__(self, file, prefix):
+        self.file = file
+        self.prefix = prefix
+
+    def write(self, piece):
+        self.file.write(piece.replace("MATLAB_PREFIX", self.prefix))
 
 
 # Generate Everything ________________________________________________________
@@ -2515,107 +3067,105 @@ def generate_everything(robot, list_ftm, list_btm, list_fk, list_jac,
                      list_com_jac)
     progress_increment = 100/total_fcts
 
+    # Name of the file without its directory (MATLAB class name), works with
+    # the separators of the OS
+    basename = os.path.basename(filename)
+    timestamp = datetime.now().strftime("%m/%d/%Y, %H:%M:%S")
+
     # Opening the file in write mode
 
     with open(filename + '.' + language.extension, 'w') as f:
         header = ("The code in this file has been generated by URDFast Code "
-                  "Generator on " + datetime.now()
-                  .strftime("%m/%d/%Y, %H:%M:%S") +
+                  "Generator on " + timestamp +
                   ". Consider testing this code before using it as errors "
                   "remain "
                   "possible. For more details, check out the github "
                   "repository "
                   "of this project at https://github.com/Teskann/URDFast.")
 
-        code = language.comment_par_beg + '\n' + \
-               language.justify(header) + \
-               '\n' + language.comment_par_end + '\n\n' + \
-               language.header + '\n'
+        # Every piece of code is written as soon as it is generated
+        if language.name == "matlab":
+            prefix = f"{basename}."
+        else:
+            prefix = ""
+
+        out = _PrefixedWriter(f, prefix)
+        write = out.write
+
+        write(language.comment_par_beg + '\n' + language.justify(header) +
+              '\n' + language.comment_par_end + '\n\n' + language.header +
+              '\n')
 
         if language.name == "matlab":
-            code += f"\nclassdef {filename.split('/')[-1]}\nmethods(Static)\n"
-            code += "\n"
+            write(f"\nclassdef {basename}\n"
+                  "methods(Static)\n")
+            write("\n")
 
-        code += generate_all_matrices(robot, list_ftm, list_btm, language,
-                                      progressbar=progressbar,
-                                      progress_increment=progress_increment)
+        generate_all_matrices(
+            robot, list_ftm, list_btm, language, progressbar=progressbar,
+            progress_increment=progress_increment, out=out)
 
         if list_fk:
-            code += '\n\n'
-            list_origin = []
-            list_dest = []
-            list_content = []
-
-            for fk in list_fk:
-                list_origin.append(fk[0])
-                list_dest.append(fk[1])
-                list_content.append(fk[2])
-
-            code += generate_all_fk(robot, list_origin, list_dest,
-                                    list_content,
-                                    optimization_level,
-                                    language,
-                                    progressbar=progressbar,
-                                    progress_increment=progress_increment)
+            write('\n\n')
+            list_origin, list_dest, list_content = map(list, zip(*list_fk))
+
+            generate_all_fk(
+                robot, list_origin, list_dest, list_content,
+                optimization_level, language, progressbar=progressbar,
+                progress_increment=progress_increment, out=out)
 
         if list_jac:
-            code += '\n\n'
-            list_origin = []
-            list_dest = []
-            list_content = []
-
-            for jac in list_jac:
-                list_origin.append(jac[0])
-                list_dest.append(jac[1])
-                list_content.append(jac[2])
-
-            code += generate_all_jac(robot, list_origin, list_dest,
-                                     list_content, optimization_level,
-                                     language,
-                                     progressbar=progressbar,
-                                     progress_increment=progress_increment)
+            write('\n\n')
+            list_origin, list_dest, list_content = map(list, zip(*list_jac))
+
+            generate_all_jac(
+                robot, list_origin, list_dest, list_content,
+                optimization_level, language, progressbar=progressbar,
+                progress_increment=progress_increment, out=out)
+
+        # With several CPUs, the CoM functions are generated at the same
+        # time, the two next sections find their code in robot.saved_code
+        _generate_coms_in_processes(robot, list_com, list_com_jac,
+                                    optimization_level, language)
 
         if list_com:
-            code += '\n\n'
-            code += generate_all_coms(robot, list_com, optimization_level,
-                                      language, progressbar=progressbar,
-                                      progress_increment=progress_increment)
+            write('\n\n')
+            generate_all_coms(
+                robot, list_com, optimization_level, language,
+                progressbar=progressbar,
+                progress_increment=progress_increment, out=out)
 
         if list_com_jac:
-            code += '\n\n'
-            code += generate_all_com_jac(
+            write('\n\n')
+            generate_all_com_jac(
                 robot, list_com_jac, optimization_level, language,
                 progressbar=progressbar,
-                progress_increment=progress_increment)
+                progress_increment=progress_increment, out=out)
 
         par = None
         if polynomial_trajectories:
-            code_, par = generate_all_polynomial_trajectories(
-                         polynomial_trajectories,
-                         language,
-                         progressbar=progressbar,
-                         progress_increment=progress_increment)
-            code += code_
+            _, par = generate_all_polynomial_trajectories(
+                     polynomial_trajectories,
+                     language,
+                     progressbar=progressbar,
+                     progress_increment=progress_increment,
+                     out=out)
 
         if control_loops_list:
-            code += generate_all_control_loops(
+            generate_all_control_loops(
                 control_loops_list,
                 robot,
                 par,
                 language,
                 progressbar=progressbar,
-                progress_increment=progress_increment)
+                progress_increment=progress_increment,
+                out=out)
 
-        code += '\n'
+        write('\n')
 
         if language.name == "matlab":
-            code += "\nend\nend\n"
-            code = code.replace("MATLAB_PREFIX",
-                                f"{filename.split('/')[-1]}.")
-        else:
-            code = code.replace("MATLAB_PREFIX", "")
+            write("\nend\nend\n")
 
-        f.write(code)
         f.close()
 
         print("Done")
@@ -6,11 +6,25 @@ Created on Sat Jun 20 14:50:36 2020
 """
 
 import re
+from functools import lru_cache
+from heapq import heappop, heappush
+
 from anytree import Node
+from sympy import cse, numbered_symbols
+from sympy.printing.precedence import PRECEDENCE
+from sympy.printing.str import StrPrinter
+
+# Numbers written in scientific notation
+_SCI_RE = re.compile(r'-?[\d.]+(?:e[\+\-]?\d+)')
+
+# Numbers (matched so that their exponent is never taken for a name) or
+# names (group 1)
+_NAME_RE = re.compile(r'(?:\d+\.?\d*|\.\d+)(?:[eE][+\-]?\d+)?|([A-Za-z_]\w*)')
 
 
 # Get rid of scientific notations ____________________________________________
 
+@lru_cache(maxsize=None)
 def scistrtodblstr(scistr, double=True):
     """
     Converts a scientific notation string to a double notation string
@@ -55,13 +69,8 @@ def convert_all_sci_to_dbl(string):
     String containing double notations instead of scientific notations
     """
 
-    # Matching scientific numbers
-    pr = re.compile(r'-?[\d.]+(?:e[\+\-]?\d+)')
-    numbers = pr.findall(string)
-
-    for number in set(numbers):
-        string = string.replace(number, scistrtodblstr(number))
-    return string
+    # Replacing every scientific number in a single pass
+    return _SCI_RE.sub(lambda m: scistrtodblstr(m.group(0)), string)
 
 
 # Getting operators with the same precedence _________________________________
@@ -1461,6 +1470,10 @@ def replace_var(string, var, new_var):
     -----------
     
     Replace a variable by another variable or expression
+
+    The  string  is scanned once : only the names equal to var are replaced
+    (not  the  longer  names containing it, nor the exponents of numbers),
+    the rest of the string is kept as it is.
     
     Parameters
     ----------
@@ -1479,19 +1492,10 @@ def replace_var(string, var, new_var):
 
     """
 
-    all_op = find_everything(string)
-
-    if len(all_op) == 0:
-        return new_var if string == var else string
-
-    tree = get_tree(all_op)
-
-    for op in all_op:
-        for i_a, arg in enumerate(op['operation']['str_val']):
-            if arg == var:
-                op['operation']['str_val'][i_a] = new_var
+    def new_name(match):
+        return new_var if match.group(1) == var else match.group(0)
 
-    return render_from_tree(tree, all_op)
+    return _NAME_RE.sub(new_name, string)
 
 
 # Optimize a function ________________________________________________________
@@ -1666,6 +1670,158 @@ def optimize(funcstr, incl_lists=False):
     return var_list, funcstr.strip()
 
 
+# Printing sympy expressions _________________________________________________
+
+class _ExpandedPowPrinter(StrPrinter):
+    """
+    Description
+    -----------
+
+    Sympy  string  printer  writing  the  small  integer  powers as products
+    (x**3 -> x*x*x), which are faster to evaluate than a generic power.
+
+    """
+
+    # Largest exponent written as a product
+    max_exponent = 4
+
+    def _is_expanded(self, expr):
+        return expr.is_Pow and expr.exp.is_Integer and \
+            1 < expr.exp <= self.max_exponent
+
+    def _print_Pow(self, expr, rational=False):
+        if self._is_expanded(expr):
+            base = self.parenthesize(expr.base, PRECEDENCE['Mul'],
+                                     strict=True)
+            # The product is always grouped : the precedence given by sympy
+            # to the surrounding product is not reliable (a negative Mul has
+            # the precedence of an Add), and a/x*x is not a/x**2
+            return '(' + '*'.join([base] * int(expr.exp)) + ')'
+        return super()._print_Pow(expr, rational)
+
+
+_PRINTER = _ExpandedPowPrinter()
+
+
+# Optimize sympy expressions _________________________________________________
+
+def optimize_sym(expressions):
+    """
+    Description
+    -----------
+
+    Same  as  optimize, but for sympy expressions : the redundant operations
+    are found by sympy.cse on the expressions themselves, without printing
+    and parsing them. Small integer powers are written as products.
+
+    Parameters
+    ----------
+
+    expressions : list of sympy.core.expr.Expr
+        Expressions to optimize together
+
+    Returns
+    -------
+
+    variables : list of dict of strings
+        List containing the definition of every variable
+        Every element of this list is a dict containing keys :
+            - 'name' (str) : variable name (v_0, v_1, ...)
+            - 'value' (str) : value of this variable
+            - 'type' (str) : 'double'
+    expressions : list of str
+        New expressions, in the same order as the given ones
+
+    """
+
+    # Variable names must not be taken by the expressions symbols
+    used = set().union(*(expr.free_symbols for expr in expressions))
+    replacements, reduced = cse(expressions,
+                                symbols=numbered_symbols('v_', exclude=used),
+                                optimizations='basic', order='none')
+
+    var_list = [{'name': str(var),
+                 'value': _PRINTER.doprint(value).replace(' ', ''),
+                 'type': 'double'} for var, value in replacements]
+
+    return recycle_variables(var_list,
+                             [_PRINTER.doprint(expr).replace(' ', '')
+                              for expr in reduced])
+
+
+# Recycle the intermediate variables _________________________________________
+
+def recycle_variables(var_list, expressions):
+    """
+    Description
+    -----------
+
+    Renames  the  intermediate variables so that a variable that is not used
+    anymore  gives  its  name  to  the next defined one. The generated code
+    then  uses  fewer  variables (and fewer registers / stack slots once
+    compiled).
+
+    Parameters
+    ----------
+
+    var_list : list of dict of strings
+        Variables  in  the  order  of  their  definition, see optimize. The
+        variables are renamed in place.
+    expressions : list of str
+        Expressions using the variables
+
+    Returns
+    -------
+
+    variables : list of dict of strings
+        var_list, with the new names
+    expressions : list of str
+        New expressions, with the new names
+
+    """
+
+    if not var_list:
+        return var_list, expressions
+
+    name_re = re.compile(r'\b(' + '|'.join(
+        re.escape(var['name']) for var in var_list) + r')\b')
+
+    # Index of the last value using every variable (len(var_list) if an
+    # expression uses it)
+    last_use = {}
+    for i_v, var in enumerate(var_list):
+        for name in name_re.findall(var['value']):
+            last_use[name] = i_v
+    for expression in expressions:
+        for name in name_re.findall(expression):
+            last_use[name] = len(var_list)
+    dead_after = {}
+    for name, i_v in last_use.items():
+        dead_after.setdefault(i_v, []).append(name)
+
+    new_names = {}
+    free_names = []  # heap of (length, name) : v_2 comes before v_10
+
+    def rename(match):
+        return new_names[match.group(1)]
+
+    for i_v, var in enumerate(var_list):
+        var['value'] = name_re.sub(rename, var['value'])
+
+        # The value is computed before the assignment : the variables it
+        # uses for the last time can already receive it
+        for name in dead_after.get(i_v, []):
+            heappush(free_names, (len(new_names[name]), new_names[name]))
+
+        old_name = var['name']
+        if free_names:
+            var['name'] = heappop(free_names)[1]
+        new_names[old_name] = var['name']
+
+    return var_list, [name_re.sub(rename, expression)
+                      for expression in expressions]
+
+
 # ----------------------------------------------------------------------------
 # | MAIN - RUNNING TESTS                                                     |
 # ----------------------------------------------------------------------------
@@ -1715,3 +1871,19 @@ if __name__ == '__main__':
     print(find_everything(func_str))
     print(optimize(func_str, True))
     # print(test)
+
+    # Testing the small powers written as products ___________________________
+
+    from sympy import lambdify, symbols
+
+    t, T, a, b = symbols('t T a b')
+    sym_exprs = [6 * t * (t - T) * (a - b) / T ** 3,
+                 -(a - b) / (T ** 2 * t ** 4) + 1 / (a + T) ** 3,
+                 (a * t - b) ** 4 / (b * T ** 2) - a ** -3]
+    values = {'t': 0.7, 'T': 2.3, 'a': -1.9, 'b': 0.4}
+    var_list, opt_exprs = optimize_sym(sym_exprs)
+    for var in var_list:
+        values[var['name']] = eval(var['value'], {}, values)
+    for sym_expr, opt_expr in zip(sym_exprs, opt_exprs):
+        expected = lambdify((t, T, a, b), sym_expr)(0.7, 2.3, -1.9, 0.4)
+        print(opt_expr, abs(eval(opt_expr, {}, values) - expected) < 1e-9)
@@ -1,9 +1,32 @@
 """
 File containing all the functions to generate docstrings for URDFast
 """
+from functools import lru_cache
+
 from Language import Language
 
 
+# Description of the symbols, by category (first part of the name) : the
+# description is prefix + joint name + suffix
+_CATEGORIES = {
+    'd': ('Translation value (in meters) along the ',
+          ' prismatic joint axis.'),
+    'dx': ('Translation value (in meters) along the X axis of the ',
+           ' joint.'),
+    'dy': ('Translation value (in meters) along the Y axis of the ',
+           ' joint.'),
+    'dz': ('Translation value (in meters) along the Z axis of the ',
+           ' joint.'),
+    'theta': ('Rotation value (in radians) around the ', ' joint axis.'),
+    'roll': ('Rotation value (in radians) around the X axis of the ',
+             ' joint.'),
+    'pitch': ('Rotation value (in radians) around the Y axis of the ',
+              ' joint.'),
+    'yaw': ('Rotation value (in radians) around the Z axis of the ',
+            ' joint.'),
+}
+
+
 # Get the parameters from sympy ______________________________________________
 
 def get_parameters(syms):
@@ -26,51 +49,44 @@ def get_parameters(syms):
             This field depends on the name of the symbol.
     """
 
-    params = []
-    for symbol in syms:
-        param = {'name': str(symbol), 'type': 'double'}
-        category = param['name'].split('_')[0]
-        descr = ''
-        if category == 'd':
-            descr += 'Translation value (in meters) along the '
-            descr += param['name'][2:] + ' prismatic joint axis.'
+    # The descriptions only depend on the symbol names : they are built once
+    # per name, every caller gets its own copy
+    return [dict(_get_parameter(str(symbol))) for symbol in syms]
 
-        elif category == 'dx':
-            descr += 'Translation value (in meters) along the X axis of the '
-            descr += param['name'][3:] + ' joint.'
 
-        elif category == 'dy':
-            descr += 'Translation value (in meters) along the Y axis of the '
-            descr += param['name'][3:] + ' joint.'
+# Parameter from a symbol name _______________________________________________
 
-        elif category == 'dz':
-            descr += 'Translation value (in meters) along the Z axis of the '
-            descr += param['name'][3:] + ' joint.'
-
-        elif category == 'dz':
-            descr += 'Translation value (in meters) along the Z axis of the '
-            descr += param['name'][3:] + ' joint.'
+@lru_cache(maxsize=None)
+def _get_parameter(name):
+    """
+    Get the parameter and its description from a symbol name
 
-        elif category == 'theta':
-            descr += 'Rotation value (in radians) around the '
-            descr += param['name'][6:] + ' joint axis.'
+    The result is cached, it must not be modified (get_parameters returns
+    copies).
 
-        elif category == 'roll':
-            descr += 'Rotation value (in radians) around the X axis of the '
-            descr += param['name'][5:] + ' joint.'
+    Parameters
+    ----------
+    name : str
+        Name of the symbol
 
-        elif category == 'pitch':
-            descr += 'Rotation value (in radians) around the Y axis of the '
-            descr += param['name'][6:] + ' joint.'
+    Returns
+    -------
 
-        elif category == 'yaw':
-            descr += 'Rotation value (in radians) around the Z axis of the '
-            descr += param['name'][4:] + ' joint.'
+    param : dict
+        Parameter created (see get_parameters for the keys)
+    """
 
-        param['description'] = descr
+    param = {'name': name, 'type': 'double'}
+    category = name.split('_')[0]
+    if category in _CATEGORIES:
+        # The joint name comes after the category and its '_'
+        prefix, suffix = _CATEGORIES[category]
+        descr = f"{prefix}{name[len(category) + 1:]}{suffix}"
+    else:
+        descr = ''
 
-        params.append(param)
-    return params
+    param['description'] = descr
+    return param
 
 
 # Convert content ____________________________________________________________
@@ -42,6 +42,17 @@ class Joint(ABC):
     Tinv : sympy.matrices.immutable.ImmutableDenseMatrix
         Inverse of the transition matrix of the joint
 
+    T_symbols : list of sympy.core.symbol.Symbol
+        Free symbols of T, sorted by name
+
+    Tinv_symbols : list of sympy.core.symbol.Symbol
+        Free  symbols  of  Tinv,  sorted by name. It is T_symbols itself
+        unless the simplification of Tinv removed some symbols of T
+
+    pretty_cache : dict
+        Pretty  printed  T  and  Tinv,  filled  by  the  code generators. Keys
+        are ('T' or 'Tinv', number of columns). Emptied when T is updated
+
     """
 
     # Init ___________________________________________________________________
@@ -83,6 +94,9 @@ class Joint(ABC):
         self.child = child
         self.T = None
         self.Tinv = None
+        self.T_symbols = []
+        self.Tinv_symbols = []
+        self.pretty_cache = {}
         self.update_T()
 
     # Update T _______________________________________________________________
@@ -92,13 +106,24 @@ class Joint(ABC):
         Description
         -----------
 
-        Updates the T and Tinv attributes calling self.__T()
+        Updates  the  T,  Tinv,  T_symbols  and Tinv_symbols attributes calling
+        self.__T() and empties pretty_cache
         """
 
         self.T = self.T_()
         self.Tinv = (self.T ** (-1)).simplify()
         self.Tinv = nsimplify(self.Tinv, tolerance=1e-10).evalf()
 
+        # Walking the expression tree is expensive : the code generators use
+        # this list instead of T.free_symbols
+        self.T_symbols = sorted(self.T.free_symbols, key=str)
+        inv_symbols = self.Tinv.free_symbols
+        if inv_symbols == set(self.T_symbols):
+            self.Tinv_symbols = self.T_symbols
+        else:
+            self.Tinv_symbols = sorted(inv_symbols, key=str)
+        self.pretty_cache = {}
+
     # T ______________________________________________________________________
 
     @abstractmethod
@@ -258,6 +283,17 @@ class JointURDF(Joint):
     Tinv : sympy.matrices.immutable.ImmutableDenseMatrix
         Inverse of the transition matrix of the joint
 
+    T_symbols : list of sympy.core.symbol.Symbol
+        Free symbols of T, sorted by name
+
+    Tinv_symbols : list of sympy.core.symbol.Symbol
+        Free  symbols  of  Tinv,  sorted by name. It is T_symbols itself
+        unless the simplification of Tinv removed some symbols of T
+
+    pretty_cache : dict
+        Pretty  printed  T  and  Tinv,  filled  by  the  code generators. Keys
+        are ('T' or 'Tinv', number of columns). Emptied when T is updated
+
     Data Structure
     --------------
 
@@ -1088,6 +1124,17 @@ class JointDH(Joint):
     Tinv : sympy.matrices.immutable.ImmutableDenseMatrix
         Inverse of the transition matrix of the joint
 
+    T_symbols : list of sympy.core.symbol.Symbol
+        Free symbols of T, sorted by name
+
+    Tinv_symbols : list of sympy.core.symbol.Symbol
+        Free  symbols  of  Tinv,  sorted by name. It is T_symbols itself
+        unless the simplification of Tinv removed some symbols of T
+
+    pretty_cache : dict
+        Pretty  printed  T  and  Tinv,  filled  by  the  code generators. Keys
+        are ('T' or 'Tinv', number of columns). Emptied when T is updated
+
     Data Structure
     --------------
 
@@ -8,7 +8,8 @@ This file doesn't implement functions to generate code for trajectories.
 Refer to code_generator.generate_polynomial_trajectory() for generation.
 """
 
-from sympy import symbols, diff, simplify, Symbol
+import numpy as np
+from sympy import symbols, diff, sympify, lambdify
 from sympy.solvers import solve, linsolve
 
 
@@ -361,6 +362,9 @@ def verify_solution(conditions, solution, function_variable):
 
     This function also verifies that the derivatives are actually correct.
 
+    The  verification  is numerical : the conditions and the derivatives are
+    evaluated at random values of their symbols.
+
     Parameters
     ----------
 
@@ -411,26 +415,20 @@ def verify_solution(conditions, solution, function_variable):
 
     """
 
-    # Verifying conditions ...................................................
+    # The  expressions  are evaluated numerically, at random values of their
+    # symbols  (sympy.lambdify  with  cse),  instead  of being simplified
+    # symbolically.  Each  check  compares  a  left  hand side to a right
+    # hand side
 
-    # A  bug  in  SymPy  is  not  rounding  float  values  if they are not
-    # multiplied  by  a  Symbol.  To  fix  this, we multiply T by a random
-    # Symbol, simplify and then divide by this Symbol.
+    checks = []
 
-    debug_sym = Symbol('debug_symbol')
-    for cond in conditions:
-        if (debug_sym * simplify(solution[cond[0]].subs(function_variable,
-                                                       cond[1]) - cond[2]))\
-                .nsimplify(tolerance=1e-8).evalf() / debug_sym != 0:
-            print('Err :', cond, solution[cond[0]].subs(function_variable,
-                                                        cond[1]) - cond[2],
-                  '\n\n')
-            return False
+    # Conditions .............................................................
 
-    # Verifying derivatives ..................................................
+    for cond in conditions:
+        checks.append((solution[cond[0]].subs(function_variable, cond[1]),
+                       sympify(cond[2]), ('Err :', cond)))
 
-    if len(solution) <= 1:
-        return True
+    # Derivatives ............................................................
 
     der = solution[0]
 
@@ -440,13 +438,34 @@ def verify_solution(conditions, solution, function_variable):
         if i > 4:
             break
 
-        if (debug_sym * simplify(diff(der, function_variable) - der_plus_1)) \
-                .nsimplify(tolerance=1e-3).evalf() / debug_sym != 0:
-            print('Err :', i, simplify(diff(der, function_variable) - der_plus_1))
-            return False
+        checks.append((diff(der, function_variable), der_plus_1,
+                       ('Err :', i)))
 
         der = der_plus_1
 
+    # Numerical verification .................................................
+
+    all_symbols = set()
+    for lhs, rhs, _ in checks:
+        all_symbols |= lhs.free_symbols | rhs.free_symbols
+    all_symbols = sorted(all_symbols, key=str)
+
+    evaluate = lambdify(all_symbols,
+                        [lhs for lhs, _, _ in checks] +
+                        [rhs for _, rhs, _ in checks],
+                        modules='numpy', cse=True)
+
+    # Values  between  0.5  and  2  :  the  time values (t0, tf, ...) are
+    # distinct and the polynomials stay far from overflow
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        values = evaluate(*rng.uniform(0.5, 2, len(all_symbols)))
+        for i_c, (lhs, rhs, error) in enumerate(checks):
+            if not np.isclose(values[i_c], values[i_c + len(checks)],
+                              rtol=1e-6, atol=1e-8):
+                print(*error, lhs - rhs, '\n\n')
+                return False
+
     return True
 
 
@@ -3,14 +3,80 @@
 Robot Objects
 """
 
-from anytree import Node, RenderTree, Walker
+from anytree import Node, RenderTree, Walker, PreOrderIter
 from URDF import URDF
-from sympy import Matrix, zeros, factor, ones, eye, nsimplify
+from sympy import Matrix, zeros, factor, ones, eye, nsimplify, cse, Add, \
+    numbered_symbols
 from joints import JointURDF, JointDH
 from links import LinkURDF, LinkDH
 from dh_params import dh
 
 
+# ----------------------------------------------------------------------------
+# | SYMBOLIC JACOBIAN                                                        |
+# ----------------------------------------------------------------------------
+
+def jacobian_fast(expressions, variables):
+    """
+    Description
+    -----------
+
+    Computes  the  Jacobian  of  expressions  with  respect  to  variables,
+    like sympy.Matrix.jacobian, using forward accumulation.
+
+    The  common  subexpressions  of  the expressions are found first (with
+    sympy.cse).  Each  of  them  is  differentiated once, and the chain rule
+    reuses  its  derivatives  everywhere  it  appears,  instead  of
+    differentiating the whole expressions again for every variable.
+
+    Parameters
+    ----------
+
+    expressions : sympy.matrices.dense.MutableDenseMatrix
+        Column vector of the expressions to differentiate
+
+    variables : list of sympy.core.symbol.Symbol
+        Derivative variables, the kth column of the Jacobian is the derivative
+        with respect to the kth variable
+
+    Returns
+    -------
+
+    J : sympy.matrices.dense.MutableDenseMatrix
+        Jacobian  matrix,  without  any  reference  to  the  common
+        subexpressions.  It  is mathematically equal to
+        expressions.jacobian(variables)
+
+    """
+
+    expressions = list(expressions)
+    used = set().union(*(expr.free_symbols for expr in expressions))
+    symbols = numbered_symbols('_cse_', exclude=used)
+    replacements, reduced = cse(expressions, symbols=symbols, order='none')
+
+    # Derivatives of every subexpression with respect to every variable
+    gradients = {}
+
+    def gradient(expr):
+        subexpressions = [s for s in expr.free_symbols if s in gradients]
+        partials = [(expr.diff(s), gradients[s]) for s in subexpressions]
+        return [expr.diff(var) + Add(*[partial * grad[k]
+                                       for partial, grad in partials])
+                for k, var in enumerate(variables)]
+
+    for symbol, value in replacements:
+        gradients[symbol] = gradient(value)
+
+    J = Matrix([gradient(expr) for expr in reduced])
+
+    # Putting the subexpressions back
+    values = {}
+    for symbol, value in replacements:
+        values[symbol] = value.xreplace(values)
+
+    return J.xreplace(values)
+
+
 # ----------------------------------------------------------------------------
 # | ROBOT CLASS                                                              |
 # ----------------------------------------------------------------------------
@@ -62,12 +128,29 @@ class Robot:
     saved_com : sympy.matrices.dense.MutableDenseMatrix or None
         Variable saving the center of mass expression of the robot.
 
+    saved_branches : dict of tuple
+        Variable  saving  the  branches  of  the  tree  that have already been
+        computed  by  self.branch().  The  keys  are  the  (origin,
+        destination) couples.
+
     saved_com_jac : sympy.matrices.dense.MutableDenseMatrix or None
         Variable saving the jacobian of the center of mass of the robot.
 
+    saved_code : dict of str
+        Variable  saving  the  code  of the FK, Jacobian, center of mass and
+        center  of  mass  jacobian  functions that have already been
+        generated,  to  not  generate  it  again  (GUI).  The  keys are the
+        (function, [origin, destination,] content, optimization_level,
+        language.cache_key) tuples.
+
     dof : list of sympy.core.symbol.Symbol
         List of all the degrees of freedom of the robot (alphabetical order)
 
+    nodes : list of tuple
+        Type  ('link' or 'joint', str) and number (int) of every node of the
+        tree,  in  pre-order  (every node comes before its children). It is
+        computed once, the code generators walk the tree with it.
+
     """
 
     # Data ===================================================================
@@ -84,18 +167,27 @@ class Robot:
     # Tree representation
     tree = None
 
+    # Tree nodes in pre-order
+    nodes = []
+
     # Saved FK
     saved_fk = {}
 
     # Saved Jacobians
     saved_jac = {}
 
+    # Saved branches
+    saved_branches = {}
+
     # Saved center of mass
     saved_com = None
 
     # Saved center of mass jacobian
     saved_com_jac = None
 
+    # Saved generated code
+    saved_code = {}
+
     # Robot mass
     mass = 0
 
@@ -110,15 +202,23 @@ class Robot:
 
         self.saved_fk = {}
         self.saved_jac = {}
+        self.saved_branches = {}
         self.saved_com = None
         self.saved_com_jac = None
+        self.saved_code = {}
 
         self.dof = []
         for joint in self.joints:
-            self.dof += list(joint.T.free_symbols)
+            self.dof += joint.T_symbols
 
         self.dof.sort(key=lambda x: x.name)
 
+        self.nodes = []
+        if self.tree is not None:
+            for node in PreOrderIter(self.tree.node):
+                node_type, node_nb = node.name.split('_')
+                self.nodes.append((node_type, int(node_nb)))
+
     # Number of Links ________________________________________________________
 
     def nlinks(self):
@@ -180,6 +280,9 @@ class Robot:
             - downwards is a list of joint numbers to go downward to
             
         Every element of the list is the index of a joint from self.joints
+
+        The  result  is  saved  in self.saved_branches : the returned lists are
+        shared between the calls and must not be modified.
         
         This  function  uses anytree Walker class, for more details, check the
         anytree documentation :
@@ -222,6 +325,11 @@ class Robot:
 
         """
 
+        # The FK and the jacobians often walk the same branches
+        saved = self.saved_branches.get((origin, destination))
+        if saved is not None:
+            return saved
+
         # Upward List
         upwards = []
 
@@ -264,6 +372,7 @@ class Robot:
             if node_type == 'joint':
                 downwards.append(node_nb)
 
+        self.saved_branches[(origin, destination)] = upwards, downwards
         return upwards, downwards
 
     # Get transition matrices between 2 Joints / Links _______________________
@@ -479,9 +588,12 @@ class Robot:
 
         else:
 
-            fk = self.forward_kinematics(origin, destination)
+            # Same FK as the FK function of this level (see com)
+            fk = self.forward_kinematics(
+                origin, destination,
+                optimization_level=1 if optimization_level < 2 else 2)
 
-            Jx = fk[0:3, 3].jacobian(self.dof)
+            Jx = jacobian_fast(fk[0:3, 3], self.dof)
             Jo = zeros(*Jx.shape)
             upwards, downwards = self.branch(origin, destination)
 
@@ -582,7 +694,8 @@ class Robot:
                 else:
                     T = self.forward_kinematics(f"link_{frame.link_id}",
                                                 f"joint_"
-                                                f"{link.child_joints[0]}")
+                                                f"{link.child_joints[0]}",
+                                                optimization_level=fk_level)
                 cm = m * (T @ hc)
                 if link.is_terminal:
                     return cm
@@ -593,6 +706,11 @@ class Robot:
                                             frame)
                     return cm
 
+            # The FK are only factored if the CoM is. They are saved with
+            # the level they really have, to be reused by the FK / Jacobians
+            # of the same level
+            fk_level = 1 if optimization_level < 2 else 2
+
             com_expr = None
             for link in self.links:
                 if link.is_root:
@@ -655,7 +773,7 @@ class Robot:
         else:
             com_expr = self.com("xyz", optimization_level)
 
-            com_jac = com_expr.jacobian(self.dof)
+            com_jac = jacobian_fast(com_expr, self.dof)
 
             if optimization_level > 1:
                 com_jac = factor(com_jac).evalf().nsimplify(tolerance=1e-10) \